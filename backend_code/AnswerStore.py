@@ -0,0 +1,67 @@
+import os
+import mmap
+import numpy as np
+
+
+class AnswerStoreWriter:
+    """Appends answers to a UTF-8 blob and writes the offsets array when closed."""
+
+    def __init__(self, path):
+        self.path = path
+        self._blob = open(path + ".bin", "wb")
+        self._offsets = [0]
+
+    def append(self, answers):
+        for answer in answers:
+            data = str(answer).encode("utf-8")
+            self._blob.write(data)
+            self._offsets.append(self._offsets[-1] + len(data))
+
+    def close(self):
+        self._blob.close()
+        np.save(path_offsets(self.path), np.asarray(self._offsets, dtype=np.int64))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def path_offsets(path):
+    return path + ".offsets.npy"
+
+
+class AnswerStore:
+    """Read-only answers store : one memory-mapped UTF-8 blob and an offsets array.
+
+    Only the answers which are asked for are decoded. The file pages are shared by the OS
+    between all the processes which open the same store (RAG runs, chat app, judge).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.offsets = np.load(path_offsets(path), mmap_mode="r")
+        with open(path + ".bin", "rb") as f:
+            # An empty file can not be mapped
+            self.blob = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if self.offsets[-1] > 0 else b""
+
+    @staticmethod
+    def exists(path):
+        return os.path.exists(path + ".bin") and os.path.exists(path_offsets(path))
+
+    @staticmethod
+    def write(path, answers):
+        with AnswerStoreWriter(path) as writer:
+            writer.append(answers)
+        return AnswerStore(path)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        start, end = self.offsets[i:i + 2]
+        return self.blob[int(start):int(end)].decode("utf-8")
+
+    def get_many(self, ids):
+        return [self[i] for i in ids if i >= 0]
@@ -0,0 +1,44 @@
+import os
+import json
+
+
+class Checkpoint:
+    """Append-only JSONL file of finished results keyed by a stable hash, to resume an interrupted run.
+
+    Every line is flushed to disk as soon as it is written, a line cut by a crash is ignored on load.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    def load(self):
+        results = {}
+        if not os.path.exists(self.path):
+            return results
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                results[entry["key"]] = entry["result"]
+        return results
+
+    def reset(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def append(self, key, result):
+        line = json.dumps({"key": key, "result": result}, ensure_ascii=False) + "\n"
+        with open(self.path, "a+b") as f:
+            # A line cut by a crash has no newline, the new result must not be written on the same line
+            f.seek(0, os.SEEK_END)
+            if f.tell() > 0:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    line = "\n" + line
+            f.write(line.encode("utf-8"))
+            f.flush()
+            os.fsync(f.fileno())
@@ -0,0 +1,92 @@
+import os
+import json
+import atexit
+import time
+import sqlite3
+import hashlib
+import threading
+
+
+def completion_key(endpoint, model, system_content, prompt_user, temperature, response_format=None):
+    fields = [endpoint, model, system_content, prompt_user, temperature]
+    # Keeps the keys of the completions cached before response_format existed
+    if response_format is not None:
+        fields.append(response_format)
+    payload = json.dumps(fields, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class CompletionCache:
+    """Persistent SQLite cache of the LLM completions.
+
+    Entries are evicted least recently used first when the cache grows over max_bytes.
+    In replay mode the cache is read only and a miss never reaches the API.
+    The last use of the hits is kept in memory and written in batches, a commit per hit
+    would make a fully cached rerun wait on the disk.
+    """
+
+    def __init__(self, path, max_bytes=1 << 30, replay=False, flush_every=1000):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.replay = replay
+        self.flush_every = flush_every
+        self.last_used = {}
+        self.lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("CREATE TABLE IF NOT EXISTS completions (key TEXT PRIMARY KEY, response TEXT, size INTEGER, last_used REAL)")
+        self.hits = 0
+        self.misses = 0
+        atexit.register(self.flush)
+
+    def get(self, key):
+        with self.lock:
+            row = self.db.execute("SELECT response FROM completions WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            if not self.replay:
+                self.last_used[key] = time.time()
+                if len(self.last_used) >= self.flush_every:
+                    self._flush()
+                    self.db.commit()
+            return row[0]
+
+    def flush(self):
+        """Writes the pending last use of the hits."""
+        with self.lock:
+            if self.last_used:
+                self._flush()
+                self.db.commit()
+
+    def _flush(self):
+        self.db.executemany("UPDATE completions SET last_used = ? WHERE key = ?",
+                            [(used, key) for key, used in self.last_used.items()])
+        self.last_used.clear()
+
+    def put(self, key, response):
+        if self.replay:
+            return
+        with self.lock:
+            self.db.execute("INSERT OR REPLACE INTO completions VALUES (?, ?, ?, ?)",
+                            (key, response, len(response.encode("utf-8")), time.time()))
+            # The eviction must see the recent hits
+            self._flush()
+            self._evict()
+            self.db.commit()
+
+    def _evict(self):
+        total = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM completions").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Oldest entries first until the cache fits again
+        freed = 0
+        to_delete = []
+        for key, size in self.db.execute("SELECT key, size FROM completions ORDER BY last_used"):
+            if total - freed <= self.max_bytes:
+                break
+            to_delete.append((key,))
+            freed += size
+        self.db.executemany("DELETE FROM completions WHERE key = ?", to_delete)
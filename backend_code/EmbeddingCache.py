@@ -0,0 +1,94 @@
+import re
+import time
+import sqlite3
+import threading
+import unicodedata
+from collections import OrderedDict
+import numpy as np
+
+
+def normalize_text(text):
+    """Questions which only differ by unicode form or whitespace share the same embedding."""
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFC", str(text))).strip()
+
+
+class EmbeddingCache:
+    """In-memory LRU of query embeddings with an optional SQLite spill-over on disk.
+
+    Entries are keyed by (model key, normalized text). The model key must contain
+    everything which changes the vectors (model name, normalization).
+    """
+
+    def __init__(self, max_entries=50_000, disk_path=None):
+        self.max_entries = max_entries
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.db = None
+        if disk_path:
+            self.db = sqlite3.connect(disk_path, check_same_thread=False)
+            self.db.execute("CREATE TABLE IF NOT EXISTS embeddings (model TEXT, text TEXT, vector BLOB, PRIMARY KEY (model, text))")
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.encode_time = 0.0
+
+    def _get(self, key):
+        if key in self.memory:
+            self.memory.move_to_end(key)
+            return self.memory[key]
+        if self.db is not None:
+            row = self.db.execute("SELECT vector FROM embeddings WHERE model = ? AND text = ?", key).fetchone()
+            if row is not None:
+                self.disk_hits += 1
+                vector = np.frombuffer(row[0], dtype=np.float32)
+                self._put(key, vector)
+                return vector
+        return None
+
+    def _put(self, key, vector):
+        self.memory[key] = vector
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_entries:
+            self.memory.popitem(last=False)
+
+    def encode(self, model_key, texts, encode):
+        """Returns the embeddings of the texts, only the unknown ones are passed to encode."""
+        keys = [(model_key, normalize_text(t)) for t in texts]
+        with self.lock:
+            vectors = [self._get(key) for key in keys]
+
+        missing = {}
+        for i, (key, vector) in enumerate(zip(keys, vectors)):
+            if vector is None:
+                missing.setdefault(key[1], []).append(i)
+        # A text repeated inside the same call is only encoded once
+        self.hits += len(texts) - len(missing)
+
+        if missing:
+            start = time.perf_counter()
+            new_vectors = encode(list(missing))
+            self.encode_time += time.perf_counter() - start
+            self.misses += len(missing)
+
+            with self.lock:
+                for (text, ids), vector in zip(missing.items(), new_vectors):
+                    vector = np.asarray(vector, dtype=np.float32)
+                    self._put((model_key, text), vector)
+                    for i in ids:
+                        vectors[i] = vector
+                if self.db is not None:
+                    self.db.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?)",
+                                        [(model_key, text, vectors[ids[0]].tobytes()) for text, ids in missing.items()])
+                    self.db.commit()
+
+        if not vectors:
+            return np.zeros((0, 0), dtype=np.float32)
+        return np.vstack(vectors)
+
+    def report(self):
+        total = self.hits + self.misses
+        hit_rate = self.hits / total if total else 0.0
+        # Time saved is estimated with the average encoding time of the misses
+        saved = self.hits * self.encode_time / self.misses if self.misses else 0.0
+        print(f"Embedding cache : {self.hits}/{total} hits ({hit_rate:.1%}, {self.disk_hits} from disk), "
+              f"~{saved:.2f}s of encoding saved")
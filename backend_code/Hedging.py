@@ -0,0 +1,83 @@
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import numpy as np
+
+
+class HedgePolicy:
+    """Sends a duplicate of a request which is slower than the observed p95, the first answer wins.
+
+    At most max_ratio of the calls are hedged, so the extra load stays bounded. Nothing is
+    hedged before min_samples latencies have been observed.
+    """
+
+    def __init__(self, max_ratio=0.1, percentile=95, min_samples=20, window=500, max_workers=64):
+        self.max_ratio = max_ratio
+        self.percentile = percentile
+        self.min_samples = min_samples
+        # Latency of the first request alone (what we would get without hedging) and of the returned answer
+        self.primary_latencies = deque(maxlen=window)
+        self.latencies = deque(maxlen=window)
+        self.calls = 0
+        self.fired = 0
+        self.won = 0
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def delay(self):
+        with self.lock:
+            if len(self.primary_latencies) < self.min_samples:
+                return None
+            return float(np.percentile(self.primary_latencies, self.percentile))
+
+    def _allow_hedge(self):
+        with self.lock:
+            if self.fired >= self.max_ratio * self.calls:
+                return False
+            self.fired += 1
+            return True
+
+    def _record_primary(self, future, start):
+        if future.exception() is None:
+            with self.lock:
+                self.primary_latencies.append(time.perf_counter() - start)
+
+    def run(self, request):
+        """Runs request() and maybe a duplicate of it, returns (result, hedged)."""
+        start = time.perf_counter()
+        with self.lock:
+            self.calls += 1
+        primary = self.executor.submit(request)
+        primary.add_done_callback(lambda future: self._record_primary(future, start))
+
+        futures = [primary]
+        delay = self.delay()
+        if delay is not None:
+            done, _ = wait([primary], timeout=delay)
+            if not done and self._allow_hedge():
+                futures.append(self.executor.submit(request))
+
+        # The first successful answer wins, the other request is left to finish on its own
+        pending = set(futures)
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    with self.lock:
+                        self.latencies.append(time.perf_counter() - start)
+                        if future is not primary:
+                            self.won += 1
+                    return future.result(), len(futures) > 1
+                error = future.exception()
+        raise error
+
+    def report(self):
+        with self.lock:
+            primary = list(self.primary_latencies)
+            returned = list(self.latencies)
+            calls, fired, won = self.calls, self.fired, self.won
+        print(f"Hedging : {fired}/{calls} calls hedged ({fired / calls if calls else 0:.1%}), the duplicate won {won} times")
+        if primary and returned:
+            print(f"p99 latency : {np.percentile(primary, 99):.2f}s without hedging, {np.percentile(returned, 99):.2f}s with hedging")
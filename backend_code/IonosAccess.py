@@ -1,43 +1,210 @@
 from dotenv import load_dotenv
+from email.utils import parsedate_to_datetime
 import os
+import json
+import time
+import random
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import requests
+from requests.adapters import HTTPAdapter
+from TokenBucket import TokenBucket
+from CompletionCache import CompletionCache, completion_key
+from Streaming import iter_sse_content, StreamMetrics
+from Telemetry import MetricsLog
+from Hedging import HedgePolicy
+from SingleFlight import SingleFlight
+
+BASE_URL = "https://openai.inference.de-txl.ionos.com/v1"
+
+# Status codes worth retrying : rate limit and server side errors
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+# The model catalogue is cached on disk and shared in memory by all the clients of the process
+MODELS_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "ionos", "models.json")
+MODELS_CACHE_TTL = 24 * 3600
+
+_shared_lock = threading.Lock()
+_sessions = {}
+_catalogues = {}
+
+
+def shared_session(base_url, token, pool_size):
+    """One keep-alive session (connection pool) per endpoint and token for the whole process."""
+    with _shared_lock:
+        key = (base_url, token)
+        if key not in _sessions:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers.update({
+                "Authorization": f"Bearer {token}",
+                "Content-Type": "application/json"
+            })
+            _sessions[key] = session
+        return _sessions[key]
+
+
+def model_catalogue(base_url, session, timeout, cache_path=MODELS_CACHE_PATH, ttl=MODELS_CACHE_TTL, offline=False):
+    """List of the available models, from memory, from the disk cache if younger than ttl, or from /models.
+
+    With offline=True /models is never called, the disk cache is used whatever its age (empty list without it).
+    """
+    with _shared_lock:
+        if base_url in _catalogues:
+            return _catalogues[base_url]
+
+        cache = {}
+        if os.path.exists(cache_path):
+            try:
+                with open(cache_path, encoding="utf-8") as f:
+                    cache = json.load(f)
+            except (OSError, ValueError):
+                cache = {}
+        entry = cache.get(base_url)
+        if entry and (offline or time.time() - entry["fetched_at"] < ttl):
+            models = entry["models"]
+        elif offline:
+            models = []
+        else:
+            models = session.get(f"{base_url}/models", timeout=timeout).json().get('data', [])
+            if models:
+                cache[base_url] = {"fetched_at": time.time(), "models": models}
+                os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+                with open(cache_path, "w", encoding="utf-8") as f:
+                    json.dump(cache, f)
+        if models:
+            _catalogues[base_url] = models
+        return models
 
 class IonosAccess:
-    def __init__(self, number=None):
+    def __init__(self, number=None, timeout=(5, 120), max_retries=5, backoff=1.0, max_backoff=60, pool_size=32,
+                 requests_per_minute=None, tokens_per_minute=None,
+                 cache_path=None, cache_max_mb=1024, replay=None, caller=None,
+                 metrics_path=None, hedge=None, hedge_max_ratio=0.1,
+                 cache_sampled=False):
+        """Nothing is sent to the network here, the model is resolved at the first completion call.
+
+        number is the position of the model in the catalogue (starting at 1) or its id.
+        The completions are cached in cache_path (IONOS_COMPLETION_CACHE by default, False disables
+        the cache), only the temperature 0 ones unless cache_sampled=True, so sampled calls stay random.
+        In replay mode (IONOS_REPLAY=1 by default) only the cache is read, a prompt which is not
+        cached gives None without any API call.
+        Every call is logged to metrics_path (IONOS_METRICS_LOG by default, False disables it) with the
+        caller tag (rag, judge, variations).
+        With hedge=True (IONOS_HEDGE=1 by default) a call slower than the observed p95 is sent a second
+        time, for at most hedge_max_ratio of the calls, and the first answer wins.
+        """
         self.Ionos_api_token = self.registration()
-        self.endpoint = "https://openai.inference.de-txl.ionos.com/v1/chat/completions"
-        self.model = self.ChooseChatBot(number)
+        # The environment is read after registration() loaded the .env file
+        if cache_path is None:
+            cache_path = os.getenv("IONOS_COMPLETION_CACHE", "llm_cache/completions.sqlite")
+        if replay is None:
+            replay = os.getenv("IONOS_REPLAY") == "1"
+        if metrics_path is None:
+            metrics_path = os.getenv("IONOS_METRICS_LOG", "llm_cache/llm_calls.jsonl")
+        if hedge is None:
+            hedge = os.getenv("IONOS_HEDGE") == "1"
+        self.base_url = os.getenv("IONOS_BASE_URL", BASE_URL).rstrip("/")
+        self.endpoint = f"{self.base_url}/chat/completions"
+        # (connect, read) timeouts in seconds
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.stats = {"requests": 0, "retries": 0, "failures": 0, "cache_hits": 0, "coalesced": 0}
+        # Time to first token and tokens/s of each streamed call
+        self.stream_metrics = []
+        self.stats_lock = threading.Lock()
+        # Limits applied to the concurrent calls of generate_many, None means no limit
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._limits = None
+        self.pool_size = pool_size
+        self.number = number
+        self._model = None
+        self.model_lock = threading.Lock()
+        self.replay = replay
+        self.cache = CompletionCache(cache_path, cache_max_mb * 1024 * 1024, replay) if cache_path else None
+        self.cache_sampled = cache_sampled
+        self.caller = caller
+        self.metrics_log = MetricsLog(metrics_path) if metrics_path else None
+        # Identical prompts in flight at the same time share one upstream call
+        self.in_flight = SingleFlight()
+        # Cleared when the endpoint rejects response_format
+        self.structured_output = True
+        self.hedge = HedgePolicy(max_ratio=hedge_max_ratio, max_workers=2 * pool_size) if hedge else None
+
+    @property
+    def session(self):
+        """Keep-alive session, the TCP and TLS connections are reused between the calls and the clients."""
+        return shared_session(self.base_url, self.Ionos_api_token, self.pool_size)
+
+    @property
+    def model(self):
+        with self.model_lock:
+            if self._model is None:
+                self._model = self.ChooseChatBot(self.number)
+            return self._model
+
+    @property
+    def limits(self):
+        """Request and token buckets of the instance, shared by all its generate_many calls."""
+        with self.model_lock:
+            if self._limits is None:
+                self._limits = (
+                    TokenBucket(self.requests_per_minute) if self.requests_per_minute else None,
+                    TokenBucket(self.tokens_per_minute) if self.tokens_per_minute else None,
+                )
+            return self._limits
+
+    def cacheable(self, temperature):
+        return self.cache is not None and (temperature == 0 or self.cache_sampled)
+
+    def count(self, name):
+        with self.stats_lock:
+            self.stats[name] += 1
 
     def registration(self):
         load_dotenv()
         Ionos_api_token = os.getenv('IONOS_API_TOKEN')
 
         #check if the file with token exists
-        print("IONOS_API_TOKEN: ", Ionos_api_token[:10], "\n")
-
         if Ionos_api_token is None:
             print("ERROR Token")
             print("Path .env :", load_dotenv(dotenv_path='.env'))
             exit()
+
+        print("IONOS_API_TOKEN: ", Ionos_api_token[:10], "\n")
         return Ionos_api_token
 
     def ChooseChatBot(self, number):
 
-        endpoint = "https://openai.inference.de-txl.ionos.com/v1/models"
+        if isinstance(number, str) and self.replay :
+            # Replaying never calls the API, the model id is taken as is
+            return number
 
-        header = {
-            "Authorization": f"Bearer {self.Ionos_api_token}", 
-            "Content-Type": "application/json"
-        }
-
-        response = requests.get(endpoint, headers=header).json()
-        models = response.get('data', [])
+        # Replaying never calls the API, the model is resolved from the catalogue cached on disk
+        models = model_catalogue(self.base_url, self.session, self.timeout, offline=self.replay)
 
         if not models:
-            print("No model available")
+            if self.replay:
+                print(f"Replay mode : no model catalogue of {self.base_url} cached in {MODELS_CACHE_PATH}, "
+                      f"give the model id instead (number=\"...\")")
+            else:
+                print("No model available")
             exit()
 
-        if number is not None :
+        if isinstance(number, str) :
+            ids = [model['id'] for model in models]
+            if number not in ids:
+                print(f"Unknown model {number}, available : {ids}")
+                exit()
+            model_name = number
+
+        elif number is not None :
             model_name = models[number-1]['id']
         
         else :
@@ -59,13 +226,92 @@ class IonosAccess:
             
         return model_name
     
-    def generate_content(self, prompt_user, temperature=0, system_content="Sie sind ein hilfsbereiter Assistent."):
+    def retry_delay(self, attempt, response=None):
+        """Exponential backoff with jitter, the Retry-After header of the server wins when present.
 
-        headers = {
-            "Authorization": f"Bearer {self.Ionos_api_token}",
-            "Content-Type": "application/json"
-        }
+        A Retry-After of 0 (or a date already past) falls back to the backoff, so the retries are
+        not all spent within milliseconds.
+        """
+        delay = random.uniform(0, min(self.backoff * 2 ** attempt, self.max_backoff))
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after:
+            try:
+                wait = float(retry_after)
+            except ValueError:
+                try:
+                    wait = parsedate_to_datetime(retry_after).timestamp() - time.time()
+                except (TypeError, ValueError):
+                    wait = 0
+            if wait > 0:
+                return min(wait, self.max_backoff)
+        return delay
+
+    def record_call(self, call, status, start, usage=None):
+        if self.metrics_log is None:
+            return
+        usage = usage or {}
+        self.metrics_log.record(
+            caller=self.caller, model=self.model, status=status,
+            latency=time.perf_counter() - start, retries=call["retries"],
+            prompt_tokens=usage.get("prompt_tokens", 0), completion_tokens=usage.get("completion_tokens", 0),
+            **{name: value for name, value in call.items() if name != "retries"}
+        )
+
+    def post(self, data, call=None):
+        """Sends the request, retrying on 429/5xx and on connection errors."""
+        if self.hedge is None:
+            return self.send(data, call=call).json()
+
+        # Each copy of a hedged request counts its own retries, the winner's are kept
+        def request():
+            attempt_call = {"retries": 0}
+            return self.send(data, call=attempt_call).json(), attempt_call
+
+        (result, attempt_call), hedged = self.hedge.run(request)
+        if call is not None:
+            call.update(attempt_call, hedged=hedged)
+        return result
+
+    def send(self, data, stream=False, call=None):
+        """Returns the response of the first successful attempt, with stream=True its body is not read yet.
 
+        The number of retries is written in call["retries"].
+        """
+        for attempt in range(self.max_retries + 1):
+            if call is not None:
+                call["retries"] = attempt
+            self.count("requests")
+            response = None
+            try:
+                response = self.session.post(self.endpoint, json=data, timeout=self.timeout, stream=stream)
+                if response.status_code not in RETRY_STATUS:
+                    response.raise_for_status()
+                    return response
+                error = requests.HTTPError(f"{response.status_code} Error for url: {self.endpoint}", response=response)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+
+            if attempt == self.max_retries:
+                raise error
+            self.count("retries")
+            delay = self.retry_delay(attempt, response)
+            print(f"Retry {attempt + 1}/{self.max_retries} in {delay:.1f}s after: {error}")
+            time.sleep(delay)
+
+    def generate_content(self, prompt_user, temperature=0, system_content="Sie sind ein hilfsbereiter Assistent.",
+                         response_format=None):
+        """Answer of the model, None on failure.
+
+        response_format (e.g. a json_schema) asks for structured output; an endpoint which rejects
+        it gets the request again without it, and it is not sent anymore by this instance.
+        """
+
+        cached = self.cached_content(prompt_user, temperature, system_content, response_format)
+        if cached is not None:
+            return cached
+        return self.generate_uncached(prompt_user, temperature, system_content, response_format)
+
+    def request_data(self, prompt_user, temperature, system_content, response_format=None):
         data = {
             "model": self.model,
             "messages": [
@@ -74,21 +320,186 @@ class IonosAccess:
             ],
             "temperature": temperature 
         }
+        if response_format is not None and self.structured_output:
+            data["response_format"] = response_format
+        return data
+
+    def cached_content(self, prompt_user, temperature=0, system_content="Sie sind ein hilfsbereiter Assistent.",
+                       response_format=None):
+        """Cached answer of the prompt, None when it is not cacheable or not cached."""
+        if not self.cacheable(temperature):
+            return None
+        start = time.perf_counter()
+        key = completion_key(self.endpoint, self.model, system_content, prompt_user, temperature, response_format)
+        cached = self.cache.get(key)
+        if cached is not None:
+            self.count("cache_hits")
+            self.record_call({"retries": 0}, "cache_hit", start)
+        return cached
+
+    def generate_uncached(self, prompt_user, temperature, system_content, response_format=None):
+        """Upstream part of generate_content, the cache was already looked up."""
+        start = time.perf_counter()
+        call = {"retries": 0}
+        if self.replay:
+            print("Replay mode : completion not in the cache")
+            self.record_call(call, "replay_miss", start)
+            return None
+
+        data = self.request_data(prompt_user, temperature, system_content, response_format)
+        key = completion_key(self.endpoint, self.model, system_content, prompt_user, temperature, response_format)
 
+        # Sampled calls are not shared, each one must get its own sample
+        if temperature != 0 and not self.cache_sampled:
+            return self.fetch(data, key, call, start)
+        content, shared = self.in_flight.do(key, lambda: self.fetch(data, key, call, start))
+        if shared:
+            self.count("coalesced")
+            self.record_call(call, "coalesced", start)
+        return content
+
+    def fetch(self, data, key, call, start):
+        """Upstream call of generate_content, the answer is stored in the cache."""
         try:
-            response = requests.post(self.endpoint, headers=headers, json=data)
-            response.raise_for_status()
-            result = response.json()
+            try:
+                result = self.post(data, call=call)
+            except requests.HTTPError as e:
+                if "response_format" not in data or e.response is None or e.response.status_code not in (400, 422):
+                    raise
+                print(f"response_format rejected by the endpoint ({e.response.status_code}), sending without it")
+                self.structured_output = False
+                data = {name: value for name, value in data.items() if name != "response_format"}
+                result = self.post(data, call=call)
 
             # Extraction of the answers
             try:
-                return result['choices'][0]['message']['content']
+                content = result['choices'][0]['message']['content']
+                if self.cacheable(data["temperature"]) and content is not None:
+                    self.cache.put(key, content)
+                self.record_call(call, "ok", start, result.get('usage'))
+                return content
             except (KeyError, IndexError) as e:
+                self.count("failures")
+                self.record_call(call, "parse_error", start, result.get('usage'))
                 print(f"Error parsing response: {result}")
                 return None
 
         except Exception as e:
+            self.count("failures")
+            self.record_call(call, "error", start)
             print(f"API Request Error: {e}")
             if hasattr(e, 'response') and e.response is not None:
                 print(f"Response details: {e.response.text}")
-            return None
\ No newline at end of file
+            return None
+
+    def generate_content_stream(self, prompt_user, temperature=0, system_content="Sie sind ein hilfsbereiter Assistent."):
+        """Yields the answer chunk by chunk as the server sends it (SSE).
+
+        The time to first token and the tokens per second of the call are appended to stream_metrics.
+        Only the opening of the stream is retried, not a stream which breaks in the middle.
+        """
+        metrics = StreamMetrics(self.model)
+        start = time.perf_counter()
+        call = {"retries": 0}
+        key = None
+        if self.cacheable(temperature):
+            key = completion_key(self.endpoint, self.model, system_content, prompt_user, temperature)
+            cached = self.cache.get(key)
+            if cached is not None:
+                self.count("cache_hits")
+                yield from metrics.wrap([cached])
+                self.stream_metrics.append(metrics.as_dict())
+                self.record_call(call, "cache_hit", start)
+                return
+        if self.replay:
+            print("Replay mode : completion not in the cache")
+            self.record_call(call, "replay_miss", start)
+            return
+
+        data = {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": (system_content)},
+                {"role": "user", "content": prompt_user}
+            ],
+            "temperature": temperature,
+            "stream": True,
+            "stream_options": {"include_usage": True}
+        }
+
+        try:
+            response = self.send(data, stream=True, call=call)
+        except Exception as e:
+            self.count("failures")
+            self.record_call(call, "error", start)
+            print(f"API Request Error: {e}")
+            return
+
+        chunks = []
+        with response:
+            for chunk in metrics.wrap(iter_sse_content(response)):
+                chunks.append(chunk)
+                yield chunk
+            if response.usage:
+                metrics.completion_tokens = response.usage.get("completion_tokens")
+        self.stream_metrics.append(metrics.as_dict())
+        call["ttft"] = metrics.ttft
+        self.record_call(call, "ok", start, response.usage or {"completion_tokens": metrics.tokens})
+
+        if key is not None and chunks:
+            self.cache.put(key, "".join(chunks))
+
+    async def agenerate_content(self, prompt_user, temperature=0, system_content="Sie sind ein hilfsbereiter Assistent.",
+                                semaphore=None, limits=(), executor=None, response_format=None):
+        """Async variant of generate_content, the blocking call runs in a worker thread of the pooled session."""
+        # Rough token estimate (4 characters per token) plus room for the completion
+        estimated_tokens = (len(prompt_user) + len(system_content)) // 4 + 512
+        async with semaphore or asyncio.Semaphore(1):
+            loop = asyncio.get_running_loop()
+            # Only the calls which go upstream pay the rate limits, not the cache hits nor the replay misses
+            cached = await loop.run_in_executor(executor, self.cached_content, prompt_user, temperature, system_content,
+                                                response_format)
+            if cached is not None:
+                return cached
+            if not self.replay:
+                for bucket, amount in zip(limits, (1, estimated_tokens)):
+                    if bucket is not None:
+                        await bucket.acquire(amount)
+            return await loop.run_in_executor(executor, self.generate_uncached, prompt_user, temperature, system_content,
+                                              response_format)
+
+    async def agenerate_many(self, prompts, concurrency=8, temperature=0, system_content="Sie sind ein hilfsbereiter Assistent.",
+                             progress=None, on_result=None, response_format=None):
+        semaphore = asyncio.Semaphore(concurrency)
+        limits = self.limits
+        done = 0
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            async def run(index, prompt):
+                nonlocal done
+                answer = await self.agenerate_content(prompt, temperature, system_content, semaphore, limits, executor,
+                                                      response_format)
+                if on_result:
+                    on_result(index, answer)
+                done += 1
+                if progress:
+                    progress(done, len(prompts))
+                return answer
+
+            # gather returns the answers in the order of the prompts, whatever the order of completion
+            return await asyncio.gather(*(run(index, prompt) for index, prompt in enumerate(prompts)))
+
+    def generate_many(self, prompts, concurrency=8, temperature=0, system_content="Sie sind ein hilfsbereiter Assistent.",
+                      progress=None, on_result=None, response_format=None):
+        """Generates the answers of all the prompts with at most concurrency calls in flight.
+
+        The answers are returned in the order of the prompts. The requests_per_minute and
+        tokens_per_minute limits of the instance are respected. on_result(index, answer) is
+        called as soon as each answer arrives.
+        """
+        coalesced = self.stats["coalesced"]
+        answers = asyncio.run(self.agenerate_many(list(prompts), concurrency, temperature, system_content, progress, on_result,
+                                                  response_format))
+        if self.stats["coalesced"] > coalesced:
+            print(f"{self.stats['coalesced'] - coalesced} calls saved by sharing identical prompts in flight")
+        return answers
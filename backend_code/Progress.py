@@ -0,0 +1,29 @@
+import time
+
+
+class Progress:
+    """progress callback of generate_many printing the rate and the ETA, at most every interval seconds."""
+
+    def __init__(self, label, interval=2.0):
+        self.label = label
+        self.interval = interval
+        self.start = time.perf_counter()
+        self.last = None
+
+    def __call__(self, done, total):
+        now = time.perf_counter()
+        if done < total and self.last is not None and now - self.last < self.interval:
+            return
+        self.last = now
+        elapsed = now - self.start
+        rate = done / elapsed if elapsed > 0 else 0.0
+        eta = (total - done) / rate if rate else float("inf")
+        print(f"{self.label} {done}/{total} | {rate:.1f}/s | elapsed {format_duration(elapsed)} | ETA {format_duration(eta)}")
+
+
+def format_duration(seconds):
+    if seconds == float("inf"):
+        return "?"
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h{minutes:02d}m{seconds:02d}s" if hours else f"{minutes}m{seconds:02d}s"
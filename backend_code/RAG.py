@@ -1,47 +1,46 @@
 import os
+import time
 import pandas as pd
-import numpy as np
-from sentence_transformers import SentenceTransformer
-import faiss
 import IonosAccess as I
+from Progress import Progress
+from Retriever import Retriever
+from RetrievalService import RetrievalClient
+from EmbeddingCache import EmbeddingCache
 
 
 class RAG:
-    def __init__(self, number=None, stupid=False):
-        self.IonosAccess = I.IonosAccess(number=number)
-        
+    def __init__(self, number=None, stupid=False, retrieval_url=None, index_type=None, index_params=None, quantization=None):
+        self.IonosAccess = I.IonosAccess(number=number, caller="rag")
+        self.number = number
+        self.retriever = None
+        # A running RetrievalService can be used instead of loading the model and the index here
+        self.retrieval_url = retrieval_url or os.getenv("RETRIEVAL_SERVICE_URL")
+        # Index backend of the Retriever (see Retriever.INDEX_TYPES and QUANTIZATIONS), the same
+        # settings as build_index.py load the index it built
+        self.index_type = index_type or os.getenv("RAG_INDEX", "flat")
+        self.index_params = index_params
+        self.quantization = quantization or os.getenv("RAG_QUANTIZATION", "fp32")
+
     def build_RAG(self):
 
+        if self.retrieval_url:
+            self.retriever = RetrievalClient(self.retrieval_url)
+            return self.retriever
+
         # Load CSV
         script_dir = os.path.dirname(os.path.abspath(__file__))
         input_csv = os.path.join(script_dir, "faqs_metro_german.csv")
-        df = pd.read_csv(input_csv)
-
-        # Prepare Q&A
-        questions = df["article_title_translated"].tolist()
-        answers = df["article_desc_text_translated"].tolist()
 
-        # Generate the embeddings
-        model = SentenceTransformer('all-MiniLM-L6-v2')
-        question_embeddings = model.encode(questions, convert_to_tensor=True)
-        dimension = question_embeddings.shape[1]
-        index = faiss.IndexFlatL2(dimension)
-        index.add(question_embeddings.cpu().numpy())
-        faiss.write_index(index, "faqs_index.faiss")
-        np.save("faqs_answers.npy", answers)
+        # Generate the embeddings (or load them from the cache), the retriever keeps the index in memory.
+        # Normalized embeddings with an inner-product index, the same index as the chat app
+        os.makedirs("rag_cache", exist_ok=True)
+        embedding_cache = EmbeddingCache(disk_path=os.path.join("rag_cache", "query_embeddings.sqlite"))
+        self.retriever = Retriever(normalize=True, index_type=self.index_type, index_params=self.index_params, quantization=self.quantization,
+                                   embedding_cache=embedding_cache).build_from_csv(input_csv, "article_title_translated", "article_desc_text_translated")
 
-        return model
+        return self.retriever
 
-    def get_rag_answer(self, question, model, k=3, stupid=False):
-
-        # Generate the embedding of the question
-        question_embedding = model.encode([question], convert_to_tensor=True)
-        index = faiss.read_index("faqs_index.faiss")
-        answers = np.load("faqs_answers.npy", allow_pickle=True)
-
-        # Search for the clossest data
-        distances, indices = index.search(question_embedding.cpu().numpy(), k)
-        relevant_answers = [answers[i] for i in indices[0]]
+    def build_prompt(self, question, relevant_answers, stupid=False):
 
         if stupid:
             prompt = (
@@ -61,31 +60,51 @@ class RAG:
                 + "Wenn Nutzer andere Fragen stellen, zu denen du keine Information aus dem FAQ hast, weise freundlich und entschieden darauf hin, dass du als Metro-Chatbot hierzu keine Antwort geben kannst."
                 + "Wenn du dir nicht wirklich sicher bist, weise freundlich und entschieden darauf hin, dass du als Metro-Chatbot hierzu keine Antwort geben kannst."
             )
-        return prompt, relevant_answers
+        return prompt
 
-    def run_all_questions_RAG(self, stupid=False, csv_input="critical_faqs_metro_german.csv", output_name="answersStupTRICK"):
+    def get_rag_answer(self, question, k=3, stupid=False):
+
+        # Search for the clossest data
+        distances, relevant_answers = self.retriever.search(question, k=k)
+        return self.build_prompt(question, relevant_answers, stupid=stupid), relevant_answers
+
+    def get_rag_prompts(self, questions, k=3, stupid=False, batch_size=256):
+        """Retrieves the context of all questions at once and builds every prompt before any LLM call."""
+        distances, indices, relevant_answers = self.retriever.search_batch(questions, k=k, batch_size=batch_size)
+        prompts = [self.build_prompt(question, context, stupid=stupid) for question, context in zip(questions, relevant_answers)]
+        return prompts, relevant_answers
+
+    def run_all_questions_RAG(self, stupid=False, csv_input="critical_faqs_metro_german.csv", output_name="answersStupTRICK", concurrency=1):
 
         # Get the CSV
         script_dir = os.path.dirname(os.path.abspath(__file__))
         input_csv = os.path.join(script_dir, csv_input)
         df = pd.read_csv(input_csv)
 
-        RAG_model = self.build_RAG()
+        self.build_RAG()
+
+        # Retrieval stage : embed and search all the questions in batches
+        questions = df["modifiert question"].astype(str).tolist()
+        start = time.perf_counter()
+        prompts, contexts = self.get_rag_prompts(questions, stupid=stupid)
+        print(f"Retrieval of {len(questions)} questions done in {time.perf_counter() - start:.2f}s")
 
-        df["answer_chatbot"] = ""
-        # Get the answer for each question
-        for index, row in df.iterrows():
-            question = row["modifiert question"]
-            print(f"Question {index+1}/{len(df)} : {question[:50]}...")
-            prompt, context = self.get_rag_answer(question, RAG_model, stupid=stupid)
-            answer = self.IonosAccess.generate_content(prompt)
-            df.at[index, "answer_chatbot"] = answer
+        # Get the answer for each question, concurrency calls at a time, in the order of the questions
+        df["answer_chatbot"] = self.IonosAccess.generate_many(
+            prompts, concurrency=concurrency,
+            progress=Progress("Questions answered")
+        )
 
         # Save new CSV
         output_csv = os.path.join(script_dir, f"{output_name}_{self.number}.csv")
         df.to_csv(output_csv, index=False)
         print(f"File saved : {output_csv}")
 
+        if getattr(self.retriever, "embedding_cache", None) is not None:
+            self.retriever.embedding_cache.report()
+        if self.IonosAccess.hedge is not None:
+            self.IonosAccess.hedge.report()
+
 if __name__ == "__main__":
     RAG = RAG(number=1, stupid=True)
     RAG.run_all_questions_RAG()
\ No newline at end of file
@@ -0,0 +1,174 @@
+import os
+import json
+import time
+import queue
+import argparse
+import threading
+from concurrent.futures import Future
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import numpy as np
+import requests
+from Retriever import Retriever, INDEX_TYPES, QUANTIZATIONS
+
+
+class MicroBatcher:
+    """Groups the texts of concurrent callers into one encoder call.
+
+    A batch is sent to the encoder when it holds max_batch texts or when the first
+    request of the batch waited max_wait_ms, whichever comes first.
+    """
+
+    def __init__(self, encode, max_batch=256, max_wait_ms=5):
+        self.encode = encode
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.queue = queue.Queue()
+        self.stats = {"requests": 0, "texts": 0, "batches": 0}
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def submit(self, texts):
+        future = Future()
+        self.queue.put((list(texts), future))
+        return future.result()
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            n_texts = len(batch[0][0])
+            deadline = time.monotonic() + self.max_wait
+            while n_texts < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+                n_texts += len(batch[-1][0])
+
+            texts = [text for item_texts, _ in batch for text in item_texts]
+            try:
+                vectors = self.encode(texts)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            self.stats["requests"] += len(batch)
+            self.stats["texts"] += len(texts)
+            self.stats["batches"] += 1
+            start = 0
+            for item_texts, future in batch:
+                future.set_result(vectors[start:start + len(item_texts)])
+                start += len(item_texts)
+
+
+class RetrievalService:
+    """Loads the model and the index once and serves embed, search and retrieve_context."""
+
+    def __init__(self, retriever, max_batch=256, max_wait_ms=5):
+        self.retriever = retriever.load()
+        # Warm up the encoder so that the first caller does not pay the model loading
+        retriever.encode(["warmup"])
+        self.batcher = MicroBatcher(retriever.encode, max_batch=max_batch, max_wait_ms=max_wait_ms)
+
+    def embed(self, texts):
+        return self.batcher.submit(texts)
+
+    def search(self, questions, k=3):
+        return self.retriever.search_vectors(self.embed(questions), k=k)
+
+    def retrieve_context(self, questions, k=3):
+        distances, indices, answers = self.search(questions, k=k)
+        return ["\n".join(context) for context in answers]
+
+    def handle(self, path, body):
+        if path == "/embed":
+            return {"embeddings": self.embed(body["texts"]).tolist()}
+        if path == "/search":
+            distances, indices, answers = self.search(body["questions"], k=body.get("k", 3))
+            return {"distances": distances.tolist(), "indices": indices.tolist(), "answers": answers}
+        if path == "/retrieve_context":
+            return {"contexts": self.retrieve_context(body["questions"], k=body.get("k", 3))}
+        if path == "/stats":
+            return dict(self.batcher.stats)
+        return None
+
+    def serve(self, host="127.0.0.1", port=8765):
+        service = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length) or b"{}")
+                try:
+                    result = service.handle(self.path, body)
+                except Exception as e:
+                    return self._reply(500, {"error": str(e)})
+                if result is None:
+                    return self._reply(404, {"error": f"Unknown path {self.path}"})
+                self._reply(200, result)
+
+            def do_GET(self):
+                self.do_POST()
+
+            def _reply(self, status, result):
+                data = json.dumps(result).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        print(f"Retrieval service listening on http://{host}:{port}")
+        server.serve_forever()
+
+
+class RetrievalClient:
+    """Talks to a running RetrievalService, with the same search methods as the Retriever."""
+
+    def __init__(self, url=None, timeout=60):
+        self.url = (url or os.getenv("RETRIEVAL_SERVICE_URL", "http://127.0.0.1:8765")).rstrip("/")
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def _post(self, path, body):
+        response = self.session.post(self.url + path, json=body, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def encode(self, texts, batch_size=None):
+        return np.asarray(self._post("/embed", {"texts": list(texts)})["embeddings"], dtype=np.float32)
+
+    def search(self, question, k=3):
+        distances, indices, answers = self.search_batch([question], k=k)
+        return distances[0], answers[0]
+
+    def search_batch(self, questions, k=3, batch_size=None):
+        result = self._post("/search", {"questions": list(questions), "k": k})
+        return np.asarray(result["distances"]), np.asarray(result["indices"]), result["answers"]
+
+    def retrieve_context(self, questions, k=3):
+        return self._post("/retrieve_context", {"questions": list(questions), "k": k})["contexts"]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local retrieval service shared by the chat app and the RAG scripts.")
+    parser.add_argument("--csv", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "faqs_metro_german.csv"))
+    parser.add_argument("--question-col", default="article_title_translated")
+    parser.add_argument("--answer-col", default="article_desc_text_translated")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--max-batch", type=int, default=256)
+    parser.add_argument("--max-wait-ms", type=float, default=5)
+    parser.add_argument("--index", default=os.getenv("RAG_INDEX", "flat"), choices=INDEX_TYPES)
+    parser.add_argument("--quantization", default=os.getenv("RAG_QUANTIZATION", "fp32"), choices=QUANTIZATIONS)
+    args = parser.parse_args()
+
+    retriever = Retriever(normalize=True, index_type=args.index, quantization=args.quantization).build_from_csv(
+        args.csv, args.question_col, args.answer_col)
+    RetrievalService(retriever, max_batch=args.max_batch, max_wait_ms=args.max_wait_ms).serve(args.host, args.port)
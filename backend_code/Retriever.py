@@ -0,0 +1,315 @@
+import os
+import json
+import time
+import hashlib
+import numpy as np
+import pandas as pd
+from sentence_transformers import SentenceTransformer
+import faiss
+from AnswerStore import AnswerStore, AnswerStoreWriter
+
+
+def file_hash(path):
+    """Hash of the file contents, used as cache key."""
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def text_hash(text):
+    return hashlib.sha1(str(text).encode("utf-8")).hexdigest()
+
+
+INDEX_TYPES = ("flat", "ivf", "hnsw", "ivfpq")
+
+# How the vectors are stored in the index, FAISS computes the distances directly on the codes
+QUANTIZATIONS = ("fp32", "fp16", "int8", "pq")
+
+# Search parameters are not stored inside the FAISS file, they are applied again after each load
+SEARCH_PARAMS = ("nprobe", "efSearch")
+
+
+def resolve_index_params(index_type, n_vectors, params=None, quantization="fp32"):
+    """Fills the missing parameters of an index type with defaults suited to the corpus size."""
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type {index_type}, choose one of {INDEX_TYPES}")
+    if quantization not in QUANTIZATIONS:
+        raise ValueError(f"Unknown quantization {quantization}, choose one of {QUANTIZATIONS}")
+    params = dict(params or {})
+    if index_type in ("ivf", "ivfpq"):
+        # FAISS wants about 39 training points per centroid
+        default_nlist = int(4 * np.sqrt(max(n_vectors, 1)))
+        params.setdefault("nlist", max(1, min(default_nlist, n_vectors // 39)))
+        params.setdefault("nprobe", min(8, params["nlist"]))
+    if index_type == "ivfpq" or quantization == "pq":
+        params.setdefault("m", 48)
+        params.setdefault("nbits", int(min(8, max(1, np.log2(max(n_vectors // 39, 2))))))
+    if index_type == "hnsw":
+        params.setdefault("M", 32)
+        params.setdefault("efConstruction", 40)
+        params.setdefault("efSearch", 64)
+    return params
+
+
+def make_index(index_type, dimension, normalize=False, params=None, quantization="fp32"):
+    """Creates an empty FAISS index of the given type, see resolve_index_params for the parameters."""
+    params = params or {}
+    metric = faiss.METRIC_INNER_PRODUCT if normalize else faiss.METRIC_L2
+    codes = {
+        "fp32": lambda: "Flat",
+        "fp16": lambda: "SQfp16",
+        "int8": lambda: "SQ8",
+        "pq": lambda: f"PQ{params['m']}x{params['nbits']}",
+    }
+    code = codes[quantization]()
+    descriptions = {
+        "flat": lambda: code,
+        "ivf": lambda: f"IVF{params['nlist']},{code}",
+        "hnsw": lambda: f"HNSW{params['M']}" if quantization == "fp32" else f"HNSW{params['M']}_{code}",
+        # IVF-PQ is already product-quantized
+        "ivfpq": lambda: f"IVF{params['nlist']},PQ{params['m']}x{params['nbits']}",
+    }
+    index = faiss.index_factory(dimension, descriptions[index_type](), metric)
+    if index_type == "hnsw":
+        index.hnsw.efConstruction = params["efConstruction"]
+    return index
+
+
+def set_search_params(index, params):
+    space = faiss.ParameterSpace()
+    for name in SEARCH_PARAMS:
+        if name in params:
+            space.set_index_parameter(index, name, params[name])
+
+
+class Retriever:
+    """Keeps the embedding model, the FAISS index and the answers in memory.
+
+    Built indexes are cached on disk under a key made of the hash of the CSV contents,
+    the embedding model name, the normalization setting and the index type with its parameters.
+    The index type is one of INDEX_TYPES, flat is exact and the others are approximate.
+    The quantization (one of QUANTIZATIONS) stores the vectors as float16, int8 or PQ codes to save memory.
+    An EmbeddingCache can be given to avoid encoding the same questions again.
+    """
+
+    def __init__(self, model_name='all-MiniLM-L6-v2', cache_dir="rag_cache", normalize=False, index_type="flat", index_params=None,
+                 quantization="fp32", embedding_cache=None):
+        self.model_name = model_name
+        self.cache_dir = cache_dir
+        self.normalize = normalize
+        self.index_type = index_type
+        self.index_params = dict(index_params or {})
+        self.quantization = quantization
+        self.embedding_cache = embedding_cache
+        self.index_path = None
+        self.answers_path = None
+        self.params_path = None
+        self._model = None
+        self.index = None
+        self.answers = None
+
+    @property
+    def model(self):
+        # The model is only loaded when something has to be encoded, a warm cache does not need it
+        if self._model is None:
+            self._model = SentenceTransformer(self.model_name)
+        return self._model
+
+    def encode(self, texts, batch_size=256, use_cache=True):
+        if use_cache and self.embedding_cache is not None:
+            model_key = f"{self.model_name}|norm{int(self.normalize)}"
+            embeddings = self.embedding_cache.encode(model_key, list(texts), lambda missing: self._encode(missing, batch_size))
+        else:
+            embeddings = self._encode(texts, batch_size)
+        return np.ascontiguousarray(embeddings, dtype=np.float32)
+
+    def _encode(self, texts, batch_size):
+        return self.model.encode(list(texts), batch_size=batch_size, convert_to_numpy=True,
+                                 normalize_embeddings=self.normalize)
+
+    def _new_index(self, question_embeddings, n_vectors=None):
+        n_vectors = n_vectors or len(question_embeddings)
+        params = resolve_index_params(self.index_type, n_vectors, self.index_params, self.quantization)
+        index = make_index(self.index_type, question_embeddings.shape[1], self.normalize, params, self.quantization)
+        if not index.is_trained:
+            index.train(question_embeddings)
+        return index, params
+
+    def _settings_key(self):
+        params = "".join(f"_{name}{value}" for name, value in sorted(self.index_params.items()))
+        return f"{self.model_name.replace('/', '_')}_norm{int(self.normalize)}_{self.index_type}_{self.quantization}{params}"
+
+    def _entry_dir(self, content_hash):
+        key = hashlib.sha256(f"{content_hash}|{self._settings_key()}".encode("utf-8")).hexdigest()[:24]
+        return os.path.join(self.cache_dir, key)
+
+    def _set_paths(self, entry_dir):
+        self.index_path = os.path.join(entry_dir, "faqs_index.faiss")
+        self.answers_path = os.path.join(entry_dir, "faqs_answers")
+        self.params_path = os.path.join(entry_dir, "index_params.json")
+
+    def build_from_csv(self, csv_path, question_col="article_title_translated", answer_col="article_desc_text_translated",
+                       chunksize=None, processes=None, expected_rows=None):
+        """Loads the cached index of this CSV or builds it, re-embedding only the rows which changed.
+
+        With a chunksize the CSV is streamed instead, see build_streaming.
+        """
+        start = time.perf_counter()
+        entry_dir = self._entry_dir(file_hash(csv_path))
+        self._set_paths(entry_dir)
+
+        if os.path.exists(self.index_path) and AnswerStore.exists(self.answers_path):
+            self.index = None
+            self.load()
+            print(f"RAG cache hit : index loaded in {time.perf_counter() - start:.2f}s")
+            return self
+
+        if chunksize:
+            self.build_streaming(csv_path, question_col, answer_col, entry_dir, chunksize, processes, expected_rows)
+        else:
+            df = pd.read_csv(csv_path)
+            self.build(df[question_col].tolist(), df[answer_col].tolist(), entry_dir=entry_dir)
+        print(f"RAG cache miss : index built in {time.perf_counter() - start:.2f}s")
+        return self
+
+    def build_streaming(self, csv_path, question_col, answer_col, entry_dir, chunksize=50_000, processes=None, expected_rows=None):
+        """Builds the index of a large CSV chunk by chunk with a multi-process CPU encoder pool.
+
+        Only one chunk of vectors is in memory at a time, the vectors are added to the index
+        and the answers appended to the store as they arrive. Trained index types are trained
+        on the first chunk, expected_rows (if known) sizes their parameters for the whole file.
+        The row-level embedding cache of build is not used here since it keeps every vector.
+        """
+        self._set_paths(entry_dir)
+        os.makedirs(entry_dir, exist_ok=True)
+        processes = processes or os.cpu_count()
+        pool = self.model.start_multi_process_pool(target_devices=["cpu"] * processes)
+
+        index, params, n_rows = None, None, 0
+        try:
+            with AnswerStoreWriter(self.answers_path) as writer:
+                for chunk in pd.read_csv(csv_path, usecols=[question_col, answer_col], chunksize=chunksize):
+                    vectors = self.model.encode_multi_process(chunk[question_col].astype(str).tolist(), pool,
+                                                              normalize_embeddings=self.normalize)
+                    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+                    if index is None:
+                        index, params = self._new_index(vectors, n_vectors=expected_rows)
+                    index.add(vectors)
+                    writer.append(chunk[answer_col].tolist())
+                    n_rows += len(chunk)
+                    print(f"Indexed {n_rows} FAQ rows...")
+        finally:
+            self.model.stop_multi_process_pool(pool)
+
+        set_search_params(index, params)
+        faiss.write_index(index, self.index_path)
+        with open(self.params_path, "w", encoding="utf-8") as f:
+            json.dump({"index_type": self.index_type, "quantization": self.quantization, "params": params}, f)
+        self.index = index
+        self.answers = AnswerStore(self.answers_path)
+        return self
+
+    def build(self, questions, answers, entry_dir=None):
+        """Builds the index, reusing the cached embeddings of the questions which did not change."""
+        if entry_dir is None:
+            entry_dir = self._entry_dir(text_hash("\x1f".join(map(str, list(questions) + list(answers)))))
+        self._set_paths(entry_dir)
+        os.makedirs(entry_dir, exist_ok=True)
+
+        row_hashes = [text_hash(q) for q in questions]
+        state = self._load_state()
+        question_embeddings, n_encoded = self._embed_rows(questions, row_hashes, state)
+        self.index, params = self._incremental_index(row_hashes, question_embeddings, state)
+        set_search_params(self.index, params)
+        print(f"Embedded {n_encoded}/{len(questions)} FAQ rows, the others came from the cache")
+
+        faiss.write_index(self.index, self.index_path)
+        with open(self.params_path, "w", encoding="utf-8") as f:
+            json.dump({"index_type": self.index_type, "quantization": self.quantization, "params": params}, f)
+        self.answers = AnswerStore.write(self.answers_path, answers)
+        self._save_state(row_hashes, question_embeddings)
+        return self
+
+    def _state_paths(self):
+        base = os.path.join(self.cache_dir, f"embeddings_{self._settings_key()}")
+        return base + ".npy", base + ".json"
+
+    def _load_state(self):
+        vectors_path, hashes_path = self._state_paths()
+        if not (os.path.exists(vectors_path) and os.path.exists(hashes_path)):
+            return [], None, None
+        with open(hashes_path, encoding="utf-8") as f:
+            state = json.load(f)
+        return state["row_hashes"], np.load(vectors_path), state.get("index_path")
+
+    def _save_state(self, row_hashes, question_embeddings):
+        vectors_path, hashes_path = self._state_paths()
+        np.save(vectors_path, question_embeddings)
+        with open(hashes_path, "w", encoding="utf-8") as f:
+            json.dump({"row_hashes": row_hashes, "index_path": self.index_path}, f)
+
+    def _embed_rows(self, questions, row_hashes, state):
+        """Returns the embeddings of all rows, only the unknown rows are encoded."""
+        old_hashes, old_vectors, _ = state
+        known = {h: i for i, h in enumerate(old_hashes)}
+        missing = [i for i, h in enumerate(row_hashes) if h not in known]
+
+        new_vectors = self.encode([questions[i] for i in missing], use_cache=False) if missing else None
+        dimension = new_vectors.shape[1] if new_vectors is not None else old_vectors.shape[1]
+
+        question_embeddings = np.empty((len(questions), dimension), dtype=np.float32)
+        for i, h in enumerate(row_hashes):
+            if h in known:
+                question_embeddings[i] = old_vectors[known[h]]
+        if missing:
+            question_embeddings[missing] = new_vectors
+        return question_embeddings, len(missing)
+
+    def _incremental_index(self, row_hashes, question_embeddings, state):
+        """Appends to the previous index when rows were only added, otherwise rebuilds it from the vectors."""
+        old_hashes, _, previous_index = state
+        appended = bool(old_hashes) and row_hashes[:len(old_hashes)] == old_hashes
+
+        if appended and previous_index and os.path.exists(previous_index):
+            # The trained index is reused as is, the new rows are only added
+            index = faiss.read_index(previous_index)
+            with open(os.path.join(os.path.dirname(previous_index), "index_params.json"), encoding="utf-8") as f:
+                params = json.load(f)["params"]
+            index.add(question_embeddings[len(old_hashes):])
+        else:
+            index, params = self._new_index(question_embeddings)
+            index.add(question_embeddings)
+        return index, params
+
+    def load(self):
+        """Loads a previously built index and its answers, only once."""
+        if self.index is None:
+            self.index = faiss.read_index(self.index_path)
+            self.answers = AnswerStore(self.answers_path)
+            if os.path.exists(self.params_path):
+                with open(self.params_path, encoding="utf-8") as f:
+                    set_search_params(self.index, json.load(f)["params"])
+        return self
+
+    def search(self, question, k=3):
+        """Returns the distances and the k closest answers for one question."""
+        distances, indices, answers = self.search_batch([question], k=k)
+        return distances[0], answers[0]
+
+    def search_batch(self, questions, k=3, batch_size=256):
+        """Returns the distances, the indices and the k closest answers for each question.
+
+        All the questions are encoded in large batches and searched with one matrix search.
+        """
+        question_embeddings = self.encode(questions, batch_size=batch_size)
+        return self.search_vectors(question_embeddings, k=k)
+
+    def search_vectors(self, question_embeddings, k=3):
+        """Same as search_batch for questions which are already encoded."""
+        self.load()
+        distances, indices = self.index.search(np.ascontiguousarray(question_embeddings, dtype=np.float32), k)
+        # Only the k returned answers are read from the store and decoded
+        answers = [self.answers.get_many(row) for row in indices]
+        return distances, indices, answers
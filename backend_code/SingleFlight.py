@@ -0,0 +1,35 @@
+import threading
+from concurrent.futures import Future
+
+
+class SingleFlight:
+    """Concurrent calls with the same key share one execution and its result."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.in_flight = {}
+        self.saved = 0
+
+    def do(self, key, function):
+        """Returns (result, shared), shared is True when the result came from a call already in flight."""
+        with self.lock:
+            future = self.in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self.in_flight[key] = future
+            else:
+                self.saved += 1
+        if not leader:
+            return future.result(), True
+
+        try:
+            result = function()
+            future.set_result(result)
+            return result, False
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self.lock:
+                del self.in_flight[key]
@@ -0,0 +1,79 @@
+import json
+import time
+
+
+def iter_sse_content(response):
+    """Text chunks of an OpenAI-compatible SSE stream (data: {...} lines ending with data: [DONE]).
+
+    The usage block sent by some servers with the last chunk is stored in response.usage.
+    """
+    response.usage = None
+    # chunk_size=None hands over each chunk of a chunked response as soon as it arrives
+    for line in response.iter_lines(chunk_size=None, decode_unicode=True):
+        if not line or not line.startswith("data:"):
+            continue
+        payload = line[len("data:"):].strip()
+        if payload == "[DONE]":
+            break
+        chunk = json.loads(payload)
+        if chunk.get("usage"):
+            response.usage = chunk["usage"]
+        for choice in chunk.get("choices", []):
+            content = (choice.get("delta") or {}).get("content")
+            if content:
+                yield content
+
+
+def iter_ndjson_content(response):
+    """Text chunks of an Ollama NDJSON stream (one JSON object per line until done is true)."""
+    # chunk_size=None hands over each chunk of a chunked response as soon as it arrives
+    for line in response.iter_lines(chunk_size=None, decode_unicode=True):
+        if not line:
+            continue
+        chunk = json.loads(line)
+        content = (chunk.get("message") or {}).get("content")
+        if content:
+            yield content
+        if chunk.get("done"):
+            break
+
+
+class StreamMetrics:
+    """Time to first token and tokens per second of one streamed completion."""
+
+    def __init__(self, model):
+        self.model = model
+        self.start = time.perf_counter()
+        self.ttft = None
+        self.total = None
+        self.chunks = 0
+        self.completion_tokens = None
+
+    def wrap(self, chunks):
+        for chunk in chunks:
+            if self.ttft is None:
+                self.ttft = time.perf_counter() - self.start
+            self.chunks += 1
+            yield chunk
+        self.total = time.perf_counter() - self.start
+
+    @property
+    def tokens(self):
+        # Each chunk is about one token when the server does not send the usage
+        return self.completion_tokens or self.chunks
+
+    @property
+    def tokens_per_second(self):
+        if self.total is None or self.ttft is None or self.total <= self.ttft:
+            return None
+        return self.tokens / (self.total - self.ttft)
+
+    def as_dict(self):
+        return {"model": self.model, "ttft": self.ttft, "total": self.total,
+                "tokens": self.tokens, "tokens_per_second": self.tokens_per_second}
+
+    def summary(self):
+        if self.ttft is None:
+            return f"{self.model} : no token received"
+        speed = f"{self.tokens_per_second:.1f} tokens/s" if self.tokens_per_second else "n/a tokens/s"
+        return f"{self.model} : first token after {self.ttft:.2f}s, {speed}, {self.total:.2f}s in total"
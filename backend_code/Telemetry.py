@@ -0,0 +1,21 @@
+import os
+import json
+import time
+import threading
+
+
+class MetricsLog:
+    """Append-only JSONL log with one line per LLM call."""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    def record(self, **fields):
+        fields.setdefault("timestamp", time.time())
+        line = json.dumps(fields, ensure_ascii=False)
+        with self.lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
@@ -0,0 +1,39 @@
+import time
+import asyncio
+import threading
+
+
+class TokenBucket:
+    """Asyncio token bucket refilled continuously at rate_per_minute, with a burst of one minute.
+
+    Used for the requests-per-minute and tokens-per-minute limits of the LLM calls.
+    A request bigger than the whole bucket waits until the bucket is full.
+    The bucket lives as long as its IonosAccess, so it is shared by the event loops of successive
+    generate_many calls : the state is guarded by a threading lock and the waiting happens outside it.
+    """
+
+    def __init__(self, rate_per_minute):
+        self.rate = rate_per_minute / 60
+        self.capacity = rate_per_minute
+        self.tokens = rate_per_minute
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount=1):
+        """Takes amount tokens, possibly on credit, and returns the seconds to wait before using them."""
+        amount = min(amount, self.capacity)
+        with self.lock:
+            self._refill()
+            # A negative balance queues the callers in arrival order
+            self.tokens -= amount
+            return max(0.0, -self.tokens / self.rate)
+
+    async def acquire(self, amount=1):
+        wait = self.reserve(amount)
+        if wait > 0:
+            await asyncio.sleep(wait)
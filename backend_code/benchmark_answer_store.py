@@ -0,0 +1,66 @@
+import os
+import time
+import tempfile
+import argparse
+import multiprocessing
+import numpy as np
+import pandas as pd
+from AnswerStore import AnswerStore
+
+
+def rss_mb():
+    """Resident memory of this process which is not shared with other processes (Linux)."""
+    with open("/proc/self/statm") as f:
+        size, resident, shared = [int(v) for v in f.read().split()[:3]]
+    return (resident - shared) * os.sysconf("SC_PAGE_SIZE") / 1e6
+
+
+def measure(kind, path, ids, queue):
+    """Runs in a fresh process : loads the answers and reads the k answers of some searches."""
+    before = rss_mb()
+    start = time.perf_counter()
+    if kind == "npy":
+        answers = np.load(path + ".npy", allow_pickle=True)
+    else:
+        answers = AnswerStore(path)
+    load_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for row in ids:
+        [answers[i] for i in row]
+    read_time = time.perf_counter() - start
+    queue.put((load_time, read_time / len(ids), rss_mb() - before))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load time and RSS of the pickled .npy answers against the memory-mapped answer store.")
+    parser.add_argument("--n", type=int, default=500_000, help="number of answers (the FAQ answers are repeated)")
+    parser.add_argument("--searches", type=int, default=1000)
+    parser.add_argument("-k", type=int, default=3)
+    args = parser.parse_args()
+
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    faq = pd.read_csv(os.path.join(script_dir, "..", "questions", "faqs_metro_german.csv"))
+    base = faq["FAQ answers"].drop_duplicates().astype(str).tolist()
+    answers = [f"{base[i % len(base)]} ({i})" for i in range(args.n)]
+    ids = np.random.default_rng(0).integers(0, args.n, (args.searches, args.k))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "faqs_answers")
+        np.save(path + ".npy", np.asarray(answers, dtype=object))
+        AnswerStore.write(path, answers)
+        del answers
+
+        print(f"{args.n} answers, {args.searches} searches with k={args.k}\n")
+        for kind in ["npy", "store"]:
+            context = multiprocessing.get_context("spawn")
+            queue = context.Queue()
+            process = context.Process(target=measure, args=(kind, path, ids, queue))
+            process.start()
+            load_time, read_time, rss = queue.get()
+            process.join()
+            print(f"{kind:<6}: load {load_time * 1000:8.1f} ms | {read_time * 1e6:6.1f} us per search | +{rss:7.1f} MB private RSS")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+import time
+import argparse
+import numpy as np
+import faiss
+from Retriever import INDEX_TYPES, QUANTIZATIONS, resolve_index_params, make_index, set_search_params
+
+
+def synthetic_vectors(n, dimension, n_clusters=200, seed=0):
+    """Clustered vectors which look more like sentence embeddings than uniform noise."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((n_clusters, dimension)).astype(np.float32)
+    labels = rng.integers(0, n_clusters, n)
+    vectors = centers[labels] + 0.3 * rng.standard_normal((n, dimension)).astype(np.float32)
+    return np.ascontiguousarray(vectors / np.linalg.norm(vectors, axis=1, keepdims=True))
+
+
+def recall_at_k(found, truth):
+    k = truth.shape[1]
+    hits = sum(len(set(f) & set(t)) for f, t in zip(found, truth))
+    return hits / (len(truth) * k)
+
+
+def benchmark_index(index_type, vectors, queries, truth, k, normalize, params=None, quantization="fp32"):
+    params = resolve_index_params(index_type, len(vectors), params, quantization)
+    start = time.perf_counter()
+    index = make_index(index_type, vectors.shape[1], normalize, params, quantization)
+    if not index.is_trained:
+        index.train(vectors)
+    index.add(vectors)
+    set_search_params(index, params)
+    build_time = time.perf_counter() - start
+
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        index.search(query[None, :], k)
+        latencies.append(time.perf_counter() - start)
+    distances, found = index.search(queries, k)
+
+    return {
+        "index": index_type,
+        "params": params,
+        "recall": recall_at_k(found, truth),
+        "p50_ms": np.percentile(latencies, 50) * 1000,
+        "p99_ms": np.percentile(latencies, 99) * 1000,
+        "memory_mb": faiss.serialize_index(index).nbytes / 1e6,
+        "build_s": build_time,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall@k against the exact flat index, query latency and memory of each index type.")
+    parser.add_argument("--n", type=int, default=100_000, help="number of synthetic FAQ vectors")
+    parser.add_argument("--dim", type=int, default=384, help="embedding dimension (all-MiniLM-L6-v2 = 384)")
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("-k", type=int, default=3)
+    parser.add_argument("--types", nargs="+", default=list(INDEX_TYPES), choices=INDEX_TYPES)
+    parser.add_argument("--quantization", default="fp32", choices=QUANTIZATIONS, help="storage of the vectors in the index")
+    parser.add_argument("--normalize", action="store_true", help="inner product on normalized vectors instead of L2")
+    args = parser.parse_args()
+
+    vectors = synthetic_vectors(args.n + args.queries, args.dim)
+    vectors, queries = vectors[:args.n], vectors[args.n:]
+
+    exact = make_index("flat", args.dim, args.normalize)
+    exact.add(vectors)
+    _, truth = exact.search(queries, args.k)
+
+    print(f"{args.n} vectors, dim {args.dim}, {args.queries} queries, k={args.k}, storage {args.quantization}\n")
+    print(f"{'index':<8}{'recall@k':>10}{'p50 ms':>10}{'p99 ms':>10}{'memory MB':>12}{'build s':>10}  params")
+    for index_type in args.types:
+        r = benchmark_index(index_type, vectors, queries, truth, args.k, args.normalize, quantization=args.quantization)
+        print(f"{r['index']:<8}{r['recall']:>10.3f}{r['p50_ms']:>10.3f}{r['p99_ms']:>10.3f}{r['memory_mb']:>12.1f}{r['build_s']:>10.1f}  {r['params']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+import os
+import time
+import tempfile
+import argparse
+import numpy as np
+import pandas as pd
+from Telemetry import MetricsLog
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tokens and wall time per judged row with several rows per judge call, and agreement with single-row judging.")
+    parser.add_argument("--input", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "evaldata", "model_1_v1_1_merged.csv"))
+    parser.add_argument("--rows", type=int, default=200, help="number of rows judged at each batch size")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--trick", action="store_true")
+    parser.add_argument("--mock", type=int, metavar="PORT", help="judge with the local mock server on this port instead of IONOS")
+    args = parser.parse_args()
+
+    if args.mock:
+        from mock_ionos_server import start_mock_server
+        start_mock_server(args.mock, latency="lognormal:0.5,0.4", tokens_per_second=200)
+        os.environ["IONOS_BASE_URL"] = f"http://127.0.0.1:{args.mock}/v1"
+        os.environ.setdefault("IONOS_API_TOKEN", "mock-token")
+    from MetroJuge import MetroJudge, RUBRICS
+
+    df = pd.read_csv(args.input).head(args.rows).reset_index(drop=True)
+    judge = MetroJudge(number=1)
+    # Every batch size must reach the endpoint
+    judge.IonosAccess.cache = None
+    metrics = list(RUBRICS.keys())
+
+    scores = {}
+    print(f"{len(df)} rows, concurrency {args.concurrency}\n")
+    print(f"{'batch':>5}{'calls':>7}{'prompt tok/row':>16}{'compl. tok/row':>16}{'s/row':>8}{'judged':>8}{'agreement':>11}{'mean |diff|':>13}")
+    for batch_size in args.batch_sizes:
+        log_path = os.path.join(tempfile.mkdtemp(), "calls.jsonl")
+        judge.IonosAccess.metrics_log = MetricsLog(log_path)
+        judged = {}
+        start = time.perf_counter()
+        judge.judge_rows(df, list(range(len(df))), args.trick, args.concurrency, batch_size,
+                         on_judged=lambda position, result: judged.__setitem__(position, result))
+        elapsed = time.perf_counter() - start
+
+        calls = pd.read_json(log_path, lines=True)
+        scores[batch_size] = pd.DataFrame(
+            {metric: [judged[i][metric]["score"] if i in judged else np.nan for i in range(len(df))] for metric in metrics},
+            dtype=float)
+
+        # Agreement of every metric score with the single-row judgements
+        reference = scores.get(1)
+        if reference is not None and batch_size != 1:
+            both = reference.notna() & scores[batch_size].notna()
+            agreement = f"{(reference == scores[batch_size])[both].stack().mean():.3f}"
+            diff = f"{(reference - scores[batch_size]).abs()[both].stack().mean():.3f}"
+        else:
+            agreement = diff = "-"
+        print(f"{batch_size:>5}{len(calls):>7}{calls['prompt_tokens'].sum() / len(df):>16.0f}"
+              f"{calls['completion_tokens'].sum() / len(df):>16.0f}{elapsed / len(df):>8.3f}{len(judged):>8}{agreement:>11}{diff:>13}")
+
+
+if __name__ == "__main__":
+    main()
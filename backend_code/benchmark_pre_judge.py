@@ -0,0 +1,38 @@
+import os
+import argparse
+import numpy as np
+import pandas as pd
+from Retriever import Retriever
+from MetroJuge import pre_judge, METRICS, COLUMN_MAP
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Judge calls saved by the local pre-judge and agreement of its scores with a report of the LLM judge.")
+    parser.add_argument("report", nargs="?", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "evaldata", "model_1_v1_1_merged.csv"),
+                        help="report of the LLM judge (e.g. evaldata/*_merged.csv)")
+    parser.add_argument("--trick", action="store_true")
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[0.5, 0.8, 0.85, 0.9, 0.95])
+    args = parser.parse_args()
+
+    report = pd.read_csv(args.report).rename(columns=COLUMN_MAP)
+    llm_scores = report[[f"{metric}_Score" for metric in METRICS]].to_numpy(dtype=float)
+    # Only the embedding model is needed, no IONOS client and no token
+    provisional = pre_judge(report, Retriever(normalize=True).encode, args.trick)
+    local_scores = provisional[[f"{metric}_Score" for metric in METRICS]].to_numpy(dtype=float)
+    judged = ~np.isnan(llm_scores)
+
+    print(f"{len(report)} rows of {args.report}")
+    print(f"rules : {provisional['rule'].replace('', 'none').value_counts().to_dict()}\n")
+    print(f"{'min conf.':>9}{'calls saved':>13}" + "".join(f"{metric[:12]:>14}" for metric in METRICS) + f"{'mean |diff|':>13}")
+    for threshold in args.thresholds:
+        local = (provisional["confidence"] >= threshold).to_numpy()
+        mask = judged & local[:, None]
+        # Share of the locally scored metrics with exactly the score of the LLM judge
+        agreement = [(local_scores[mask[:, i], i] == llm_scores[mask[:, i], i]).mean() if mask[:, i].any() else np.nan
+                     for i in range(len(METRICS))]
+        diff = np.abs(local_scores - llm_scores)[mask].mean() if mask.any() else np.nan
+        print(f"{threshold:>9.2f}{local.mean():>13.1%}" + "".join(f"{a:>14.3f}" for a in agreement) + f"{diff:>13.3f}")
+
+
+if __name__ == "__main__":
+    main()
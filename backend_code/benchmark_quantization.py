@@ -0,0 +1,46 @@
+import os
+import argparse
+import numpy as np
+import pandas as pd
+import faiss
+from Retriever import Retriever, QUANTIZATIONS, resolve_index_params, make_index, set_search_params
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memory saved against retrieval accuracy lost by each quantization, on test_fragen.csv.")
+    parser.add_argument("--index", default="flat", help="index type used with each quantization")
+    parser.add_argument("-k", type=int, default=3)
+    parser.add_argument("--normalize", action="store_true")
+    args = parser.parse_args()
+
+    # The variations of test_fragen.csv know which FAQ question they come from
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    df = pd.read_csv(os.path.join(script_dir, "..", "questions", "test_fragen.csv"))
+    faq_questions = df["FAQ questions"].drop_duplicates().tolist()
+    position = {q: i for i, q in enumerate(faq_questions)}
+    expected = df["FAQ questions"].map(position).to_numpy()
+
+    retriever = Retriever(normalize=args.normalize)
+    faq_embeddings = retriever.encode(faq_questions)
+    query_embeddings = retriever.encode(df["modifiert question"].astype(str).tolist())
+
+    print(f"{len(faq_questions)} FAQ entries, {len(df)} test questions, index {args.index}\n")
+    print(f"{'storage':<8}{'bytes/vector':>14}{'top-1 acc':>11}{f'hit@{args.k}':>9}")
+    for quantization in QUANTIZATIONS:
+        params = resolve_index_params(args.index, len(faq_embeddings), quantization=quantization)
+        index = make_index(args.index, faq_embeddings.shape[1], args.normalize, params, quantization)
+        if not index.is_trained:
+            index.train(faq_embeddings)
+        index.add(faq_embeddings)
+        set_search_params(index, params)
+
+        _, found = index.search(query_embeddings, args.k)
+        top1 = np.mean(found[:, 0] == expected)
+        hit_k = np.mean((found == expected[:, None]).any(axis=1))
+        # Size of the whole serialized index divided by the number of vectors, so the overhead is included
+        bytes_per_vector = faiss.serialize_index(index).nbytes / index.ntotal
+        print(f"{quantization:<8}{bytes_per_vector:>14.0f}{top1:>11.3f}{hit_k:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+import os
+import time
+import tempfile
+import numpy as np
+import pandas as pd
+import faiss
+from Retriever import Retriever
+
+
+def load_faq_corpus(script_dir):
+    """Returns the unique FAQ questions/answers and the modified questions used as queries."""
+    input_csv = os.path.join(script_dir, "..", "questions", "faqs_metro_german.csv")
+    df = pd.read_csv(input_csv)
+    faq = df.drop_duplicates(subset="FAQ questions")
+    return faq["FAQ questions"].tolist(), faq["FAQ answers"].tolist(), df["modifiert question"].tolist()
+
+
+def per_question_reload(retriever, queries, k=3):
+    """Old behaviour of RAG.get_rag_answer: index and pickled answers are read from disk for every question."""
+    answers_npy = retriever.answers_path + ".npy"
+    np.save(answers_npy, np.asarray([retriever.answers[i] for i in range(len(retriever.answers))], dtype=object))
+    for question in queries:
+        question_embedding = retriever.model.encode([question], convert_to_numpy=True)
+        index = faiss.read_index(retriever.index_path)
+        answers = np.load(answers_npy, allow_pickle=True)
+        distances, indices = index.search(question_embedding, k)
+        [answers[i] for i in indices[0]]
+
+
+def in_memory(retriever, queries, k=3):
+    for question in queries:
+        retriever.search(question, k=k)
+
+
+def batched(retriever, queries, k=3):
+    retriever.search_batch(queries, k=k)
+
+
+def run_benchmark(n_queries=None, k=3):
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    questions, answers, queries = load_faq_corpus(script_dir)
+    queries = queries[:n_queries]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        retriever = Retriever(cache_dir=tmp).build(questions, answers)
+
+        print(f"Corpus: {len(questions)} FAQ entries, {len(queries)} queries, k={k}\n")
+        for name, fn in [("reload per question", per_question_reload), ("in-memory retriever", in_memory), ("batched retriever", batched)]:
+            start = time.perf_counter()
+            fn(retriever, queries, k=k)
+            elapsed = time.perf_counter() - start
+            print(f"{name:<22}: {elapsed * 1000 / len(queries):.2f} ms/question")
+
+
+def startup_benchmark(n_added=5):
+    """Cold build, warm start from the cache and incremental build after adding a few FAQ rows."""
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    questions, answers, queries = load_faq_corpus(script_dir)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "faqs.csv")
+        cache_dir = os.path.join(tmp, "cache")
+        df = pd.DataFrame({"article_title_translated": questions, "article_desc_text_translated": answers})
+
+        timings = []
+        df.iloc[:-n_added].to_csv(csv_path, index=False)
+        for name in ["cold", "warm"]:
+            start = time.perf_counter()
+            Retriever(cache_dir=cache_dir).build_from_csv(csv_path)
+            timings.append((name, time.perf_counter() - start))
+
+        df.to_csv(csv_path, index=False)
+        start = time.perf_counter()
+        Retriever(cache_dir=cache_dir).build_from_csv(csv_path)
+        timings.append((f"+{n_added} rows", time.perf_counter() - start))
+
+        print()
+        for name, elapsed in timings:
+            print(f"{name:<22}: startup in {elapsed * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    run_benchmark()
+    startup_benchmark()
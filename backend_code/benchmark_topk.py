@@ -0,0 +1,64 @@
+import time
+import argparse
+import numpy as np
+import faiss
+from benchmark_index import synthetic_vectors
+
+
+def top_k_indices(scores, k):
+    """Indices of the k highest scores of each row, best first, without sorting the whole row."""
+    scores = np.atleast_2d(scores)
+    k = min(k, scores.shape[1])
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1)
+    return np.take_along_axis(top, order, axis=1)
+
+
+def full_sort(query, embeddings, k):
+    """Old chat app retrieval : similarity with every FAQ entry, then argsort of all the rows."""
+    sims = (query @ embeddings.T)[0]
+    return sims.argsort()[-k:][::-1]
+
+
+def partition(query, embeddings, k):
+    return top_k_indices(query @ embeddings.T, k)[0]
+
+
+def timed(fn, queries, repeat):
+    latencies = []
+    for query in queries[:repeat]:
+        start = time.perf_counter()
+        fn(query[None, :])
+        latencies.append(time.perf_counter() - start)
+    return np.median(latencies) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-turn retrieval latency of the chat app at growing FAQ sizes.")
+    parser.add_argument("--sizes", nargs="+", type=int, default=[1_000, 100_000, 1_000_000])
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("-k", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'entries':>10}{'argsort ms':>13}{'argpartition ms':>17}{'IndexFlatIP ms':>16}{'HNSW ms':>10}")
+    for n in args.sizes:
+        vectors = synthetic_vectors(n + args.queries, args.dim)
+        embeddings, queries = vectors[:n], vectors[n:]
+
+        flat = faiss.IndexFlatIP(args.dim)
+        flat.add(embeddings)
+        hnsw = faiss.IndexHNSWFlat(args.dim, 32, faiss.METRIC_INNER_PRODUCT)
+        hnsw.add(embeddings)
+
+        results = [
+            timed(lambda q: full_sort(q, embeddings, args.k), queries, args.queries),
+            timed(lambda q: partition(q, embeddings, args.k), queries, args.queries),
+            timed(lambda q: flat.search(q, args.k), queries, args.queries),
+            timed(lambda q: hnsw.search(q, args.k), queries, args.queries),
+        ]
+        print(f"{n:>10}{results[0]:>13.3f}{results[1]:>17.3f}{results[2]:>16.3f}{results[3]:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+import os
+import time
+import argparse
+import requests
+from mock_ionos_server import start_mock_server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput of a new connection per call against the pooled IonosAccess session.")
+    parser.add_argument("--calls", type=int, default=500)
+    parser.add_argument("--port", type=int, default=8901)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of 429 answers, to exercise the retries")
+    args = parser.parse_args()
+
+    start_mock_server(args.port, rate_limit_rate=args.error_rate, retry_after=0)
+    os.environ["IONOS_BASE_URL"] = f"http://127.0.0.1:{args.port}/v1"
+    os.environ.setdefault("IONOS_API_TOKEN", "mock-token")
+    import IonosAccess as I
+    ionos = I.IonosAccess(number=1, backoff=0.01, cache_path=False)
+
+    data = {"model": ionos.model, "messages": [{"role": "user", "content": "Hallo"}], "temperature": 0}
+    start = time.perf_counter()
+    for _ in range(args.calls):
+        # Old transport : no session, a new connection for every call
+        requests.post(ionos.endpoint, json=data, headers={"Authorization": "Bearer mock-token"})
+    unpooled = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(args.calls):
+        ionos.generate_content("Hallo")
+    pooled = time.perf_counter() - start
+
+    print(f"\n{args.calls} calls, {args.error_rate:.0%} of 429 answers")
+    print(f"requests.post per call : {args.calls / unpooled:8.0f} calls/s")
+    print(f"pooled session         : {args.calls / pooled:8.0f} calls/s (with retries)")
+    print(f"stats                  : {ionos.stats}")
+
+
+if __name__ == "__main__":
+    main()
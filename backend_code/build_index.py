@@ -0,0 +1,21 @@
+import argparse
+from Retriever import Retriever, INDEX_TYPES, QUANTIZATIONS
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Streams a large FAQ export into the RAG index cache with all the CPU cores.")
+    parser.add_argument("csv")
+    parser.add_argument("--question-col", default="article_title_translated")
+    parser.add_argument("--answer-col", default="article_desc_text_translated")
+    parser.add_argument("--chunksize", type=int, default=50_000, help="rows read and encoded at a time")
+    parser.add_argument("--processes", type=int, default=None, help="encoder processes, all the cores by default")
+    parser.add_argument("--expected-rows", type=int, default=None, help="approximate number of rows, sizes the IVF parameters")
+    parser.add_argument("--index", default="flat", choices=INDEX_TYPES)
+    parser.add_argument("--quantization", default="fp32", choices=QUANTIZATIONS)
+    parser.add_argument("--cache-dir", default="rag_cache")
+    args = parser.parse_args()
+
+    retriever = Retriever(cache_dir=args.cache_dir, normalize=True, index_type=args.index, quantization=args.quantization)
+    retriever.build_from_csv(args.csv, args.question_col, args.answer_col,
+                             chunksize=args.chunksize, processes=args.processes, expected_rows=args.expected_rows)
+    print(f"Index with {retriever.index.ntotal} entries saved in {retriever.index_path}")
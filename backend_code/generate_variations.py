@@ -1,11 +1,11 @@
 import requests
 import os
-import Simple_Chatbot
 import pandas as pd
 import csv
 import IonosAccess as I
+from Progress import Progress
 
-def generate_paraphrases(type, Ionos):
+def generate_paraphrases(type, Ionos, concurrency=1, num_variants=5):
 
     dict = { "synonym" : "Du formulierst eine gegebene Frage in mehrere alternative Fassungen um. Behalte die ursprüngliche Bedeutung bei, ändere jedoch Struktur, Formulierung und Tonfall. Die Antworten sollen klar verständliche Fragen sein, jeweils unterschiedlich gestaltet. Antworte ausschließlich mit den umformulierten Fragen, ohne Einleitung und ohne Kommentare.",
             "scenario" :"Du verwandelst eine kurze Frage in eine ausführliche, kontextreiche Formulierung. Füge plausible Hintergrundinformationen, situative Details und erklärende Elemente hinzu, ohne die ursprüngliche Intention zu verändern. Die Frage soll am Ende klar gestellt werden, aber in einen längeren, natürlichen Kontext eingebettet sein. Antworte ausschließlich mit der erweiterten Version, ohne Einleitung und ohne Kommentare.",
@@ -13,10 +13,6 @@ def generate_paraphrases(type, Ionos):
             "keinFrage" : "Du wandelst eine gegebene Frage in verschiedene implizite Formulierungen um, bei denen das Anliegen nur angedeutet wird. Verwende keine Fragen, sondern kurze, natürliche Sätze, die den Bedarf, das Problem oder die Situation der Nutzer beschreiben. Die Bedeutung bleibt erhalten. Antwort ausschließlich mit diesen Sätzen, ohne Einleitung, ohne Listenformat, ohne Kommentare."
     }
 
-    # Initialisation
-    IONOS_API_TOKEN = Simple_Chatbot.registration()   
-    MODEL_NAME = Simple_Chatbot.ChooseChatBot(IONOS_API_TOKEN)
-
     # Get the CSV
     script_dir = os.path.dirname(os.path.abspath(__file__))
     input_csv = os.path.join(script_dir, "faqs_metro_germanclean.csv")
@@ -28,13 +24,13 @@ def generate_paraphrases(type, Ionos):
         exit()
 
     data = []
-    # Get the answer for each question
-    for index, row in df.iterrows():
-        question = row["article_title_translated"]
-        print(f"Question {index+1}/{len(df)} : {question[:50]}...")
-
-
-        answer = Ionos.generate_content("Generiert {num_variants} Varianten der folgenden Frage :\n {question}'", temperature=0.6, system_content=dict[type])
+    # Get the answer for each question, in the order of the CSV
+    prompts = [f"Generiert {num_variants} Varianten der folgenden Frage :\n {question}" for question in df["article_title_translated"]]
+    answers = Ionos.generate_many(
+        prompts, concurrency=concurrency, temperature=0.6, system_content=dict[type],
+        progress=Progress("Question")
+    )
+    for (index, row), answer in zip(df.iterrows(), answers):
         print(answer)
         answer = answer[1:]
         data.append([row["article_title_translated"], row["article_desc_text_translated"], answer])
@@ -52,5 +48,5 @@ def generate_paraphrases(type, Ionos):
                 writer.writerow([question, reponse, qm, type])
     
 if __name__ == "__main__":
-    Ionos = IonosAccess = I.IonosAccess(number=1)
+    Ionos = IonosAccess = I.IonosAccess(number=1, caller="variations")
     generate_paraphrases("fehler", Ionos)
\ No newline at end of file
@@ -0,0 +1,244 @@
+import re
+import math
+import json
+import time
+import random
+import hashlib
+import argparse
+import threading
+from collections import deque
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+METRICS = ["Correctness", "Clarity", "Hospitality_Tonality", "Relevance", "Hallucination"]
+
+CANNED_ANSWERS = [
+    "Vielen Dank für Ihre Frage. Sie können Ihre Bestellung jederzeit in Ihrem METRO Kundenkonto einsehen.",
+    "Gerne helfe ich Ihnen weiter. Die Lieferung erfolgt in der Regel innerhalb von 24 Stunden.",
+    "Dazu liegen mir leider keine Informationen vor. Bitte wenden Sie sich an den METRO Kundenservice.",
+    "Sie können die Rechnung im Bereich Meine Rechnungen als PDF herunterladen.",
+]
+
+
+def parse_latency(spec):
+    """Latency distribution in seconds : fixed:0.2, uniform:0.1,0.5, normal:mean,std or lognormal:median,sigma."""
+    kind, _, values = spec.partition(":")
+    args = [float(v) for v in values.split(",")] if values else []
+    if kind == "fixed":
+        return lambda rng: args[0]
+    if kind == "uniform":
+        return lambda rng: rng.uniform(args[0], args[1])
+    if kind == "normal":
+        return lambda rng: max(0.0, rng.gauss(args[0], args[1]))
+    if kind == "lognormal":
+        # median * exp(sigma * N(0, 1)), a long tail like a real inference endpoint
+        return lambda rng: args[0] * rng.lognormvariate(0, args[1])
+    raise ValueError(f"Unknown latency distribution : {spec}")
+
+
+def estimate_tokens(text):
+    return max(1, len(text) // 4)
+
+
+def prompt_seed(prompt):
+    return int(hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:16], 16)
+
+
+ACTUAL_ANSWER = re.compile(r"### ACTUAL ANSWER \(Chatbot Output\)\s*(.*?)\s*(?=###|$)", re.S)
+ITEM_ID = re.compile(r"### ITEM (\S+)")
+
+
+def mock_judgement(answer):
+    """Scores of a chatbot answer, the same whether it is judged alone or in a batch."""
+    rng = random.Random(prompt_seed(answer))
+    return {metric: {"score": rng.randint(1, 5), "reasoning": f"Mock reasoning for {metric}."} for metric in METRICS}
+
+
+def corrupt(judgement, rng, malformed_rate):
+    """Gives a metric an out of range score with malformed_rate, like a judge which does not follow the format."""
+    if rng.random() < malformed_rate:
+        judgement[rng.choice(METRICS)]["score"] = rng.choice([0, 7, "five", None])
+    return judgement
+
+
+def mock_completion(prompt, drop_rate=0.0, malformed_rate=0.0):
+    """Deterministic answer of a prompt : judge-shaped JSON for the judge prompts, a canned answer otherwise.
+
+    A batch judge prompt (### ITEM blocks) gets a JSON array, each item is left out with drop_rate.
+    """
+    if "REQUIRED OUTPUT FORMAT" in prompt:
+        rng = random.Random(prompt_seed(prompt))
+        answers = ACTUAL_ANSWER.findall(prompt)
+        ids = ITEM_ID.findall(prompt)
+        if not ids:
+            return json.dumps(corrupt(mock_judgement(answers[0] if answers else prompt), rng, malformed_rate))
+        return json.dumps([{"id": item_id, **corrupt(mock_judgement(answer), rng, malformed_rate)}
+                           for item_id, answer in zip(ids, answers) if rng.random() >= drop_rate])
+    return random.Random(prompt_seed(prompt)).choice(CANNED_ANSWERS)
+
+
+class RateWindow:
+    """Requests and tokens accepted during the last minute."""
+
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.events = deque()
+        self.tokens = 0
+        self.lock = threading.Lock()
+
+    def admit(self, tokens):
+        """Returns None when the request is accepted, else the whole seconds to wait before a retry (at least 1)."""
+        with self.lock:
+            now = time.monotonic()
+            while self.events and now - self.events[0][0] > 60:
+                self.tokens -= self.events.popleft()[1]
+            over_requests = self.requests_per_minute and len(self.events) + 1 > self.requests_per_minute
+            over_tokens = self.tokens_per_minute and self.tokens + tokens > self.tokens_per_minute
+            if over_requests or over_tokens:
+                # Rounded up, a client coming back before the window moves would be refused again
+                return max(1, math.ceil(60 - (now - self.events[0][0]))) if self.events else 1
+            self.events.append((now, tokens))
+            self.tokens += tokens
+            return None
+
+
+def start_mock_server(port=8900, models=("mock-model",), latency="fixed:0", tokens_per_second=None,
+                      error_rate=0.0, rate_limit_rate=0.0, requests_per_minute=None, tokens_per_minute=None,
+                      retry_after=1, drop_rate=0.0, malformed_rate=0.0, structured_output=True, seed=0,
+                      host="127.0.0.1"):
+    """Starts an OpenAI-compatible server (/v1/models and /v1/chat/completions) in a background thread.
+
+    latency is drawn before the first token, tokens_per_second paces the completion (streamed or not).
+    error_rate and rate_limit_rate inject 500 and 429 answers, the requests_per_minute and
+    tokens_per_minute limits answer 429 with a Retry-After header like the real endpoint.
+    drop_rate leaves items out of the batch judge answers, malformed_rate breaks a score of the judge answers.
+    With structured_output=False a request with a response_format is rejected with 400.
+    """
+    draw_latency = parse_latency(latency)
+    rng = random.Random(seed)
+    rng_lock = threading.Lock()
+    window = RateWindow(requests_per_minute, tokens_per_minute)
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            if self.path.rstrip("/").endswith("/models"):
+                return self._reply(200, {"object": "list", "data": [{"id": m, "object": "model"} for m in models]})
+            self._reply(404, {"error": "not found"})
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                return self._reply(404, {"error": "not found"})
+
+            if "response_format" in body and not structured_output:
+                return self._reply(400, {"error": "response_format is not supported"})
+
+            messages = body.get("messages", [])
+            prompt = "\n".join(m.get("content", "") for m in messages)
+            user = messages[-1].get("content", "") if messages else ""
+            content = mock_completion(user, drop_rate, malformed_rate)
+            usage = {"prompt_tokens": estimate_tokens(prompt), "completion_tokens": estimate_tokens(content)}
+            usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+
+            with rng_lock:
+                draw = rng.random()
+                delay = draw_latency(rng)
+            if draw < rate_limit_rate:
+                return self._reply(429, {"error": "rate limited"}, {"Retry-After": str(retry_after)})
+            if draw < rate_limit_rate + error_rate:
+                return self._reply(500, {"error": "injected server error"})
+            wait = window.admit(usage["total_tokens"])
+            if wait is not None:
+                return self._reply(429, {"error": "rate limit exceeded"}, {"Retry-After": str(wait)})
+
+            time.sleep(delay)
+            model = body.get("model", models[0])
+            if body.get("stream"):
+                include_usage = (body.get("stream_options") or {}).get("include_usage")
+                return self._stream(model, content, usage if include_usage else None)
+            if tokens_per_second:
+                time.sleep(usage["completion_tokens"] / tokens_per_second)
+            self._reply(200, {
+                "id": f"mock-{prompt_seed(prompt):x}", "object": "chat.completion", "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                "usage": usage,
+            })
+
+        def _stream(self, model, content, usage):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            # About one token (4 characters) per chunk
+            for i in range(0, len(content), 4):
+                self._chunk({"model": model, "choices": [{"index": 0, "delta": {"content": content[i:i + 4]}}]})
+                if tokens_per_second:
+                    time.sleep(1 / tokens_per_second)
+            self._chunk({"model": model, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+            if usage:
+                self._chunk({"model": model, "choices": [], "usage": usage})
+            self._write_chunk(b"data: [DONE]\n\n")
+            self._write_chunk(b"")
+
+        def _chunk(self, result):
+            self._write_chunk(f"data: {json.dumps(result, ensure_ascii=False)}\n\n".encode("utf-8"))
+
+        def _write_chunk(self, data):
+            self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+            self.wfile.flush()
+
+        def _reply(self, status, result, headers=None):
+            data = json.dumps(result, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline OpenAI-compatible mock of the IONOS inference endpoint.")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--models", nargs="+", default=["mock-model"])
+    parser.add_argument("--latency", default="lognormal:0.5,0.6",
+                        help="time to first token : fixed:s, uniform:a,b, normal:mean,std or lognormal:median,sigma")
+    parser.add_argument("--tokens-per-second", type=float, default=None, help="generation speed, unlimited by default")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of 500 answers")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="fraction of random 429 answers")
+    parser.add_argument("--requests-per-minute", type=int, default=None)
+    parser.add_argument("--tokens-per-minute", type=int, default=None)
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After of the random 429 answers, in seconds")
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="fraction of items missing from the batch judge answers")
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="fraction of judge answers with an invalid score")
+    parser.add_argument("--no-structured-output", action="store_true", help="reject the requests with a response_format")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    start_mock_server(args.port, args.models, args.latency, args.tokens_per_second, args.error_rate,
+                      args.rate_limit_rate, args.requests_per_minute, args.tokens_per_minute, args.retry_after, args.drop_rate,
+                      args.malformed_rate, not args.no_structured_output, args.seed, args.host)
+    print(f"Mock endpoint on http://{args.host}:{args.port}/v1, use it with :")
+    print(f"    IONOS_BASE_URL=http://{args.host}:{args.port}/v1 IONOS_API_TOKEN=mock python backend_code/RAG.py")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
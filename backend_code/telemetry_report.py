@@ -0,0 +1,67 @@
+import json
+import argparse
+import numpy as np
+import pandas as pd
+
+# Latency buckets of the histograms, in seconds
+BUCKETS = [0, 0.5, 1, 2, 5, 10, 20, 60, np.inf]
+
+
+def load_prices(path, input_price, output_price):
+    """Prices in EUR per million tokens : {"model": {"input": x, "output": y}}, the defaults apply to the other models."""
+    prices = {}
+    if path:
+        with open(path, encoding="utf-8") as f:
+            prices = json.load(f)
+    return lambda model: prices.get(model, {"input": input_price, "output": output_price})
+
+
+def histogram(latencies, width=40):
+    counts, _ = np.histogram(latencies, bins=BUCKETS)
+    lines = []
+    for low, high, count in zip(BUCKETS[:-1], BUCKETS[1:], counts):
+        bar = "#" * int(round(width * count / max(counts.max(), 1)))
+        label = f"{low:g}-{high:g}s" if np.isfinite(high) else f">{low:g}s"
+        lines.append(f"    {label:>8} | {bar} {count}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latency histograms and cost per 1,000 evaluated questions from the LLM call log.")
+    parser.add_argument("log", nargs="?", default="llm_cache/llm_calls.jsonl")
+    parser.add_argument("--prices", help="JSON file with the price per model in EUR per million tokens")
+    parser.add_argument("--input-price", type=float, default=0.0, help="default EUR per million prompt tokens")
+    parser.add_argument("--output-price", type=float, default=0.0, help="default EUR per million completion tokens")
+    args = parser.parse_args()
+
+    df = pd.read_json(args.log, lines=True)
+    price = load_prices(args.prices, args.input_price, args.output_price)
+    df["caller"] = df["caller"].fillna("unknown")
+    df["cost"] = [
+        (p * price(m)["input"] + c * price(m)["output"]) / 1e6
+        for m, p, c in zip(df["model"], df["prompt_tokens"], df["completion_tokens"])
+    ]
+
+    print(f"{len(df)} calls in {args.log}\n")
+    for model, calls in df.groupby("model"):
+        upstream = calls[calls["status"].isin(["ok", "parse_error", "error"])]
+        print(f"=== {model} ===")
+        print(f"  calls {len(calls)} | upstream {len(upstream)} | cache hits {(calls['status'] == 'cache_hit').sum()} "
+              f"| coalesced {(calls['status'] == 'coalesced').sum()} "
+              f"| errors {calls['status'].isin(['error', 'parse_error', 'replay_miss']).sum()} | retries {calls['retries'].sum()}")
+        if len(upstream):
+            p50, p95, p99 = np.percentile(upstream["latency"], [50, 95, 99])
+            print(f"  latency p50 {p50:.2f}s | p95 {p95:.2f}s | p99 {p99:.2f}s")
+            print(histogram(upstream["latency"]))
+        print(f"  tokens : {calls['prompt_tokens'].sum()} prompt, {calls['completion_tokens'].sum()} completion")
+
+        # One call per evaluated question and caller (a RAG answer, a judgement or a variation)
+        for caller, per_caller in calls.groupby("caller"):
+            answered = (per_caller["status"].isin(["ok", "cache_hit", "coalesced"])).sum()
+            per_1000 = per_caller["cost"].sum() / answered * 1000 if answered else 0.0
+            print(f"  {caller:<10}: {answered} questions, {per_caller['cost'].sum():.4f} EUR, {per_1000:.4f} EUR per 1,000 questions")
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,35 +1,33 @@
+import os
+import sys
 import streamlit as st
 import requests
-import pandas as pd
-import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
-from sentence_transformers import SentenceTransformer
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend_code"))
+from Retriever import Retriever
+from RetrievalService import RetrievalClient
+from EmbeddingCache import EmbeddingCache
+from Streaming import iter_ndjson_content, StreamMetrics
 
 st.set_page_config(page_title="Metro Chatbot", page_icon="🤖")
 st.title("Metro Chatbot")
 
 # -----------------------
-# Load FAQ CSV
+# Retrieval : a running RetrievalService (RETRIEVAL_SERVICE_URL) is shared by all the sessions and scripts,
+# otherwise the model and the FAQ embeddings are loaded once per process, not once per session
 # -----------------------
-faq_df = pd.read_csv("faqs_metro_german.csv")
-questions = faq_df["article_title_translated"].tolist()
-answers = faq_df["article_desc_text_translated"].tolist()
+@st.cache_resource
+def load_local_retrieval():
+    # Same normalized inner-product index as RAG.get_rag_answer, the top-k search replaces a full sort of the similarities
+    # RAG_INDEX / RAG_QUANTIZATION choose the same index backend as RAG and build_index.py
+    return Retriever(normalize=True, index_type=os.getenv("RAG_INDEX", "flat"), quantization=os.getenv("RAG_QUANTIZATION", "fp32"),
+                     embedding_cache=EmbeddingCache()).build_from_csv("faqs_metro_german.csv", "article_title_translated", "article_desc_text_translated")
 
-# -----------------------
-# Initialize local embeddings model
-# -----------------------
-if "embed_model" not in st.session_state:
-    st.session_state["embed_model"] = SentenceTransformer('all-MiniLM-L6-v2')
+@st.cache_resource
+def load_retrieval_client(url):
+    return RetrievalClient(url)
 
-# -----------------------
-# Compute FAQ embeddings (questions only)
-# -----------------------
-if "faq_question_embeddings" not in st.session_state:
-    st.session_state["faq_questions"] = questions
-    st.session_state["faq_answers"] = answers
-    st.session_state["faq_question_embeddings"] = st.session_state["embed_model"].encode(
-        questions, convert_to_numpy=True
-    )
+retrieval_url = os.getenv("RETRIEVAL_SERVICE_URL")
 
 # -----------------------
 # Initialize conversation
@@ -54,13 +52,13 @@ if user_input:
     # -----------------------
     # Compute user embedding and find top relevant FAQ entries
     # -----------------------
-    user_emb = st.session_state["embed_model"].encode([user_input], convert_to_numpy=True)
-    sims = cosine_similarity(user_emb, st.session_state["faq_question_embeddings"])[0]
-    
-    # Get top 3 relevant FAQ answers
     number_relevant_answers=3
-    top_idx = sims.argsort()[-number_relevant_answers:][::-1]
-    relevant_answers = "\n".join([st.session_state["faq_answers"][i] for i in top_idx])
+    if retrieval_url:
+        relevant_answers = load_retrieval_client(retrieval_url).retrieve_context([user_input], k=number_relevant_answers)[0]
+    else:
+        # Get top 3 relevant FAQ answers
+        distances, top_answers = load_local_retrieval().search(user_input, k=number_relevant_answers)
+        relevant_answers = "\n".join(top_answers)
     
     # -----------------------
     # Prepare messages for DeepSeek
@@ -80,18 +78,21 @@ if user_input:
     # -----------------------
     # Call local DeepSeek model
     # -----------------------
-    response = requests.post(
-        "http://localhost:11434/api/chat",
-        json={
-            "model": "deepseek-r1",
-            "messages": messages,
-            "stream": False,
-            "temperature": 0
-        }
-    )
-    
-    data = response.json()
-    assistant_reply = data["message"]["content"]
+    # The answer is rendered while the tokens arrive, with the time to first token and the speed below it
+    metrics = StreamMetrics("deepseek-r1")
+    with st.chat_message("assistant"):
+        with requests.post(
+            "http://localhost:11434/api/chat",
+            json={
+                "model": "deepseek-r1",
+                "messages": messages,
+                "stream": True,
+                "temperature": 0
+            },
+            stream=True
+        ) as response:
+            assistant_reply = st.write_stream(metrics.wrap(iter_ndjson_content(response)))
+        st.caption(metrics.summary())
 
     # -----------------------
     # Append relevant FAQ info at the end
@@ -104,4 +105,3 @@ if user_input:
     # -----------------------
     st.session_state["messages"].append({"role": "user", "content": user_input})
     st.session_state["messages"].append({"role": "assistant", "content": assistant_reply_with_faq})
-    st.chat_message("assistant").markdown(assistant_reply_with_faq)